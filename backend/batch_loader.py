@@ -0,0 +1,63 @@
+import asyncio
+import copy
+from typing import Any, Dict, List, Optional
+
+
+class BatchLoader:
+    """Coalesce id lookups made in the same event-loop tick into one $in query.
+
+    Every caller gets its own deep copy of the document (or None when the id
+    does not exist), so nested lists such as features can be changed freely.
+    Concurrent lookups for the same id share a single in-flight future;
+    nothing is cached once a batch has resolved, so reads never go stale.
+
+    One loader is shared by the whole process on purpose: coalescing lookups
+    from concurrent requests for the same hot packages is the point, and
+    because nothing outlives a batch there is no per-request state to leak.
+    """
+
+    def __init__(self, collection, key: str = "id", max_batch_size: int = 500):
+        self.collection = collection
+        self.key = key
+        self.max_batch_size = max_batch_size
+        self._pending: Dict[Any, asyncio.Future] = {}
+        self._scheduled = False
+
+    async def load(self, value: Any) -> Optional[dict]:
+        future = self._pending.get(value)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[value] = future
+            if not self._scheduled:
+                self._scheduled = True
+                loop.call_soon(self._dispatch)
+        document = await asyncio.shield(future)
+        return copy.deepcopy(document) if document is not None else None
+
+    async def load_many(self, values: List[Any]) -> List[Optional[dict]]:
+        return list(await asyncio.gather(*(self.load(value) for value in values)))
+
+    def _dispatch(self):
+        self._scheduled = False
+        batch, self._pending = self._pending, {}
+        keys = list(batch)
+        for start in range(0, len(keys), self.max_batch_size):
+            chunk = {key: batch[key] for key in keys[start:start + self.max_batch_size]}
+            asyncio.ensure_future(self._fetch(chunk))
+
+    async def _fetch(self, batch: Dict[Any, asyncio.Future]):
+        try:
+            documents = await self.collection.find(
+                {self.key: {"$in": list(batch)}}
+            ).to_list(len(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        found = {document[self.key]: document for document in documents}
+        for value, future in batch.items():
+            if not future.done():
+                future.set_result(found.get(value))
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Index options that describe the stored index rather than how to build it
+IGNORED_INDEX_OPTIONS = {"v", "ns", "key", "background"}
+
+
+async def copy_indexes(source, target):
+    """Create every secondary index of `source` on `target`"""
+    for name, info in (await source.index_information()).items():
+        if name == "_id_":
+            continue
+        keys = list(info["key"])
+        options = {option: value for option, value in info.items() if option not in IGNORED_INDEX_OPTIONS}
+        if any(field == "_fts" for field, _ in keys):
+            # Text indexes are stored as _fts/_ftsx; rebuild the field list from the weights
+            keys = [(field, direction) for field, direction in keys if field not in ("_fts", "_ftsx")]
+            keys += [(field, "text") for field in options.get("weights", {})]
+        await target.create_index(keys, name=name, **options)
+
+
+class StagedLoader:
+    """Reload whole collections without emptying the live ones.
+
+    Each collection is written to a `<name>__staging` copy with unordered
+    insert_many calls, `concurrency` chunks in flight at a time, and given the
+    live collection's indexes. Only when every collection has loaded are the
+    copies renamed over the live ones (renameCollection with dropTarget), so
+    readers see the old data until the swap and never an empty collection.
+    Each rename is atomic; collections are swapped one after another.
+    """
+
+    def __init__(self, database, chunk_size: int = 1000, concurrency: int = 4, suffix: str = "__staging"):
+        self.database = database
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.suffix = suffix
+        self.status: dict = {"state": "idle"}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, sources: Dict[str, Iterable[List[dict]]],
+              finish: Optional[Callable[[], Awaitable[None]]] = None) -> asyncio.Task:
+        """Load `sources` (collection name -> chunks of documents) in the background.
+
+        `finish` runs after the swap, e.g. to rebuild derived data.
+        """
+        if self.running:
+            raise RuntimeError("A load is already running")
+        self.status = {
+            "state": "loading",
+            "started_at": time.time(),
+            "finished_at": None,
+            "collections": {name: {"inserted": 0, "state": "pending"} for name in sources},
+            "error": None
+        }
+        self._task = asyncio.create_task(self._run(sources, finish))
+        return self._task
+
+    async def wait(self) -> dict:
+        """Wait for the current load, if any, to end; returns its final status"""
+        status = self.status
+        if self.running:
+            # Unlike awaiting the task, this neither cancels the load when the
+            # waiter is cancelled nor raises when the load was stopped
+            await asyncio.wait({self._task})
+        return status
+
+    async def stop(self):
+        """Abandon a running load; the live collections are left untouched"""
+        if self.running:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self, sources: Dict[str, Iterable[List[dict]]], finish):
+        try:
+            for name, chunks in sources.items():
+                progress = self.status["collections"][name]
+                staging = self.database[name + self.suffix]
+                await staging.drop()
+                await self.database.create_collection(staging.name)
+                progress["state"] = "loading"
+                await self._insert_chunks(staging, chunks, progress)
+                # Building indexes once the data is in is cheaper than maintaining them per insert
+                progress["state"] = "indexing"
+                await copy_indexes(self.database[name], staging)
+                progress["state"] = "staged"
+
+            self.status["state"] = "swapping"
+            for name in sources:
+                await self.database[name + self.suffix].rename(name, dropTarget=True)
+                self.status["collections"][name]["state"] = "live"
+
+            if finish:
+                self.status["state"] = "finishing"
+                await finish()
+            self.status["state"] = "completed"
+        except BaseException as e:
+            self.status["state"] = "cancelled" if isinstance(e, asyncio.CancelledError) else "failed"
+            self.status["error"] = str(e) or type(e).__name__
+            if not isinstance(e, asyncio.CancelledError):
+                logger.exception("Staged load failed; live collections were not replaced")
+            await asyncio.shield(self._drop_staging(sources))
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            self.status["finished_at"] = time.time()
+            self.status["seconds"] = round(self.status["finished_at"] - self.status["started_at"], 3)
+
+    async def _drop_staging(self, sources):
+        for name in sources:
+            try:
+                await self.database[name + self.suffix].drop()
+            except Exception:
+                logger.exception(f"Could not drop staging collection for {name}")
+
+    async def _insert_chunks(self, collection, chunks: Iterable[List[dict]], progress: dict):
+        loop = asyncio.get_running_loop()
+        iterator = iter(chunks)
+        inflight = set()
+        try:
+            while True:
+                # Generating documents is CPU work; keep it off the event loop
+                chunk = await loop.run_in_executor(None, next, iterator, None)
+                if chunk is None:
+                    break
+                for start in range(0, len(chunk), self.chunk_size):
+                    if len(inflight) >= self.concurrency:
+                        done, inflight = await asyncio.wait(inflight, return_when=asyncio.FIRST_COMPLETED)
+                        for task in done:
+                            task.result()
+                    inflight.add(asyncio.ensure_future(
+                        self._insert(collection, chunk[start:start + self.chunk_size], progress)
+                    ))
+            await asyncio.gather(*inflight)
+        finally:
+            for task in inflight:
+                task.cancel()
+
+    @staticmethod
+    async def _insert(collection, documents: List[dict], progress: dict):
+        await collection.insert_many(documents, ordered=False)
+        progress["inserted"] += len(documents)
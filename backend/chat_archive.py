@@ -0,0 +1,120 @@
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (timestamp, id) position of a message in its conversation
+MessageKey = Tuple[datetime, str]
+
+
+def message_key(message: dict) -> MessageKey:
+    return message["timestamp"], message["id"]
+
+
+class ChatArchive:
+    """Cold tier for chat history.
+
+    compact() moves messages older than the hot retention window out of the
+    hot collection into bucket documents holding up to bucket_size messages of
+    one conversation, so the hot collection and its indexes only cover recent
+    chat. Buckets expire ttl_days after their newest message (0 keeps them
+    forever). A bucket's id is derived from its first message, so a compaction
+    interrupted between writing a bucket and deleting its messages simply
+    rewrites the same bucket on the next run.
+    """
+
+    def __init__(self, hot, collection, hot_retention_days: int = 30, ttl_days: int = 365,
+                 bucket_size: int = 100):
+        self.hot = hot
+        self.collection = collection
+        self.hot_retention = timedelta(days=hot_retention_days)
+        self.ttl = timedelta(days=ttl_days) if ttl_days > 0 else None
+        self.bucket_size = bucket_size
+
+    async def create_indexes(self):
+        await self.collection.create_index([("package_id", 1), ("user_id", 1), ("last_timestamp", -1)])
+        await self.collection.create_index([("package_id", 1), ("user_id", 1), ("first_timestamp", 1)])
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+        await self.hot.create_index("timestamp")
+
+    def cutoff(self) -> datetime:
+        """Messages older than this may already live in the archive"""
+        return datetime.utcnow() - self.hot_retention
+
+    async def compact(self) -> int:
+        """Archive every message older than the hot window; returns how many moved"""
+        cutoff = self.cutoff()
+        conversations = await self.hot.aggregate([
+            {"$match": {"timestamp": {"$lt": cutoff}}},
+            {"$group": {"_id": {"package_id": "$package_id", "user_id": "$user_id"}}}
+        ]).to_list(None)
+
+        moved = 0
+        for conversation in conversations:
+            moved += await self._compact_conversation(
+                conversation["_id"]["package_id"], conversation["_id"]["user_id"], cutoff
+            )
+        if moved:
+            logger.info(f"Archived {moved} chat messages from {len(conversations)} conversations")
+        return moved
+
+    async def _compact_conversation(self, package_id: str, user_id: str, cutoff: datetime) -> int:
+        query = {"package_id": package_id, "user_id": user_id, "timestamp": {"$lt": cutoff}}
+        moved = 0
+        while True:
+            messages = await self.hot.find(query, {"_id": 0}).sort(
+                [("timestamp", 1), ("id", 1)]
+            ).limit(self.bucket_size).to_list(self.bucket_size)
+            if not messages:
+                return moved
+
+            bucket = {
+                "_id": f"{package_id}:{user_id}:{messages[0]['id']}",
+                "package_id": package_id,
+                "user_id": user_id,
+                "agent_id": messages[-1]["agent_id"],
+                "first_timestamp": messages[0]["timestamp"],
+                "last_timestamp": messages[-1]["timestamp"],
+                "count": len(messages),
+                "messages": messages,
+                "archived_at": datetime.utcnow()
+            }
+            if self.ttl:
+                bucket["expires_at"] = messages[-1]["timestamp"] + self.ttl
+            await self.collection.replace_one({"_id": bucket["_id"]}, bucket, upsert=True)
+            await self.hot.delete_many({
+                "package_id": package_id,
+                "user_id": user_id,
+                "id": {"$in": [message["id"] for message in messages]}
+            })
+            moved += len(messages)
+
+    async def read(self, package_id: str, user_id: str, limit: int,
+                   before: Optional[MessageKey] = None, after: Optional[MessageKey] = None) -> List[dict]:
+        """Archived messages of a conversation, oldest first.
+
+        With `after`, the oldest `limit` messages following it; otherwise the
+        newest `limit` messages preceding `before` (or the end of the archive).
+        Buckets of one conversation never overlap, so reading stops at the
+        first bucket that fills the page.
+        """
+        query = {"package_id": package_id, "user_id": user_id}
+        if after:
+            query["last_timestamp"] = {"$gte": after[0]}
+            buckets = self.collection.find(query).sort("first_timestamp", 1)
+        else:
+            if before:
+                query["first_timestamp"] = {"$lte": before[0]}
+            buckets = self.collection.find(query).sort("last_timestamp", -1)
+
+        messages = []
+        async for bucket in buckets.batch_size(4):
+            page = [
+                message for message in bucket["messages"]
+                if (not after or message_key(message) > after) and (not before or message_key(message) < before)
+            ]
+            messages = messages + page if after else page + messages
+            if len(messages) >= limit:
+                break
+        return messages[:limit] if after else messages[-limit:]
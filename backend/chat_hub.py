@@ -0,0 +1,81 @@
+import asyncio
+import logging
+from typing import Dict, Iterable, Set
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+
+class ChatConnection:
+    """One WebSocket session and the channels it listens on.
+
+    Outgoing events go through a bounded queue drained by a dedicated sender
+    task, so one slow client never holds up delivery to the others.
+    """
+
+    def __init__(self, websocket: WebSocket, channels: Iterable[str], queue_size: int):
+        self.websocket = websocket
+        self.channels = set(channels)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.sender = asyncio.create_task(self._send_loop())
+
+    def push(self, payload: dict) -> bool:
+        try:
+            self.queue.put_nowait(payload)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    async def _send_loop(self):
+        try:
+            while True:
+                payload = await self.queue.get()
+                await self.websocket.send_json(payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # The socket is gone; the receive loop will notice and disconnect
+            logger.debug("Chat connection send failed", exc_info=True)
+
+
+class ChatHub:
+    """In-process registry of chat WebSocket sessions keyed by channel"""
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self.dropped = 0  # Events discarded because a session's queue was full
+        self._channels: Dict[str, Set[ChatConnection]] = {}
+
+    def connect(self, websocket: WebSocket, channels: Iterable[str]) -> ChatConnection:
+        connection = ChatConnection(websocket, channels, self.queue_size)
+        for channel in connection.channels:
+            self._channels.setdefault(channel, set()).add(connection)
+        return connection
+
+    def disconnect(self, connection: ChatConnection):
+        connection.sender.cancel()
+        for channel in connection.channels:
+            subscribers = self._channels.get(channel)
+            if subscribers:
+                subscribers.discard(connection)
+                if not subscribers:
+                    del self._channels[channel]
+
+    def publish(self, channels: Iterable[str], payload: dict) -> int:
+        """Queue payload for every session on any of the channels; returns sessions reached"""
+        recipients = set()
+        for channel in channels:
+            recipients |= self._channels.get(channel, set())
+        reached = 0
+        for connection in recipients:
+            if connection.push(payload):
+                reached += 1
+            else:
+                self.dropped += 1
+        return reached
+
+    def connection_count(self) -> int:
+        return len({connection for subscribers in self._channels.values() for connection in subscribers})
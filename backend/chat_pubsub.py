@@ -0,0 +1,177 @@
+import asyncio
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the fan-out latency histogram buckets
+LATENCY_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+
+# Delivers one event to local sessions and returns how many it reached
+Deliver = Callable[[List[str], dict], int]
+
+
+class BrokerStats:
+    def __init__(self):
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.batches_sent = 0
+        self.latency_counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.latency_sum_ms = 0.0
+        self.latency_count = 0
+
+    def record_delivery(self, latency_seconds: float, reached: int):
+        latency_ms = max(latency_seconds, 0) * 1000
+        index = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if latency_ms <= bound), len(LATENCY_BUCKETS_MS))
+        self.latency_counts[index] += 1
+        self.latency_sum_ms += latency_ms
+        self.latency_count += 1
+        self.delivered += reached
+
+    def as_dict(self) -> dict:
+        return {
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "batches_sent": self.batches_sent,
+            "fanout_latency_ms": {
+                "count": self.latency_count,
+                "sum": round(self.latency_sum_ms, 3),
+                "buckets": {
+                    **{str(bound): count for bound, count in zip(LATENCY_BUCKETS_MS, self.latency_counts)},
+                    "+Inf": self.latency_counts[-1]
+                }
+            }
+        }
+
+
+class ChatBroker(ABC):
+    """Fan chat events out to every worker's local sessions.
+
+    publish() buffers events and sends them in batches, either when batch_size
+    events are waiting or after batch_delay seconds. Each worker hands received
+    events to its `deliver` callback, normally ChatHub.publish.
+    """
+
+    name = "base"
+
+    def __init__(self, batch_size: int = 100, batch_delay: float = 0.005):
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.stats = BrokerStats()
+        self._deliver: Optional[Deliver] = None
+        self._batch: List[dict] = []
+        self._flush_timer: Optional[asyncio.TimerHandle] = None
+
+    async def start(self, deliver: Deliver):
+        self._deliver = deliver
+
+    async def stop(self):
+        await self.flush()
+
+    async def publish(self, channels: Iterable[str], payload: dict):
+        self._batch.append({"channels": list(channels), "payload": payload, "published_at": time.time()})
+        self.stats.published += 1
+        if len(self._batch) >= self.batch_size:
+            await self.flush()
+        elif self._flush_timer is None:
+            loop = asyncio.get_running_loop()
+            self._flush_timer = loop.call_later(self.batch_delay, lambda: asyncio.ensure_future(self.flush()))
+
+    async def flush(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        try:
+            await self._send(batch)
+            self.stats.batches_sent += 1
+        except Exception:
+            self.stats.dropped += len(batch)
+            logger.exception(f"Dropped {len(batch)} chat events: {self.name} broker publish failed")
+
+    @abstractmethod
+    async def _send(self, batch: List[dict]):
+        """Publish a batch to every worker, including this one"""
+
+    def _receive(self, batch: List[dict]):
+        """Hand a received batch to local sessions"""
+        now = time.time()
+        for event in batch:
+            reached = self._deliver(event["channels"], event["payload"]) if self._deliver else 0
+            self.stats.record_delivery(now - event["published_at"], reached)
+
+
+class InProcessBroker(ChatBroker):
+    """Single-worker broker: batches go straight to the local hub"""
+
+    name = "in-process"
+
+    async def _send(self, batch: List[dict]):
+        self._receive(batch)
+
+
+class RedisBroker(ChatBroker):
+    """Multi-worker broker over Redis pub/sub (or any RESP-compatible server).
+
+    Every worker subscribes to one channel and receives every batch, including
+    its own, then delivers to whichever of its sessions follow the events.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, channel: str = "sponsoredtrip:chat-events", **kwargs):
+        super().__init__(**kwargs)
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("CHAT_BROKER_URL is set but the 'redis' package is not installed")
+        self.channel = channel
+        self._redis = redis.from_url(url)
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Deliver):
+        await super().start(deliver)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        await super().stop()
+        if self._listener:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+        await self._redis.aclose()
+
+    async def _send(self, batch: List[dict]):
+        await self._redis.publish(self.channel, json.dumps(batch))
+
+    async def _listen(self):
+        delay = 0.5
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                delay = 0.5
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._receive(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(f"Redis chat subscription lost; reconnecting in {delay}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+            finally:
+                await pubsub.aclose()
+
+
+def create_chat_broker(url: Optional[str]) -> ChatBroker:
+    """In-process broker unless a redis:// (or rediss://) URL is configured"""
+    if url:
+        return RedisBroker(url)
+    return InProcessBroker()
@@ -0,0 +1,142 @@
+"""Fixture snapshots: a seeded dataset dumped to compressed files for fast restores.
+
+A snapshot is a directory with one gzip file per collection, holding either
+concatenated BSON documents (<collection>.bson.gz, mongodump's format once
+decompressed) or Extended JSON lines (<collection>.ndjson.gz), plus a
+manifest.json recording document counts, file digests and an overall
+fingerprint. The server restores snapshots through /api/init-data?snapshot=<name>
+and skips the load when the fingerprint matches the one already restored.
+
+    python fixtures.py dump fixtures/default            # from MONGO_URL/DB_NAME
+    python fixtures.py dump fixtures/default --format ndjson
+    python fixtures.py info fixtures/default
+"""
+import gzip
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import bson
+from bson import json_util
+
+MANIFEST = "manifest.json"
+FORMATS = ("bson", "ndjson")
+
+# Everything a test run reads; derived state (catalog_stats, catalog_meta) is
+# rebuilt after a restore, and idempotency keys are per-run.
+SNAPSHOT_COLLECTIONS = [
+    "agents", "packages", "ribbons", "users", "bookings",
+    "chat_messages", "chat_conversations", "chat_archive", "package_inventory"
+]
+
+# Collections that normal use of the app changes (bookings also bump agent
+# totals, staff edit their agent's packages); restoring an already loaded
+# snapshot reloads only these
+MUTABLE_COLLECTIONS = [
+    "agents", "packages", "users", "bookings", "package_inventory",
+    "chat_messages", "chat_conversations", "chat_archive"
+]
+
+
+def snapshot_file(path: Path, collection: str, fmt: str) -> Path:
+    return path / f"{collection}.{fmt}.gz"
+
+
+def load_manifest(path: Path) -> dict:
+    try:
+        return json.loads((path / MANIFEST).read_text())
+    except FileNotFoundError:
+        raise ValueError(f"{path} is not a fixture snapshot (no {MANIFEST})")
+
+
+def dump_snapshot(database, path: Path, collections: Optional[List[str]] = None, fmt: str = "bson",
+                  batch_size: int = 5000) -> dict:
+    """Write `collections` of a (synchronous pymongo) database to a snapshot directory"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown snapshot format {fmt!r}")
+    path.mkdir(parents=True, exist_ok=True)
+    entries = {}
+    for collection in collections or SNAPSHOT_COLLECTIONS:
+        target = snapshot_file(path, collection, fmt)
+        digest = hashlib.sha256()
+        count = 0
+        # mtime=0 keeps the gzip header, and so the digest, stable across dumps
+        with open(target, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as out:
+            for document in database[collection].find().sort("_id", 1).batch_size(batch_size):
+                data = bson.encode(document) if fmt == "bson" else (json_util.dumps(document) + "\n").encode("utf-8")
+                out.write(data)
+                digest.update(data)
+                count += 1
+        entries[collection] = {"count": count, "sha256": digest.hexdigest()}
+
+    manifest = {
+        "format": fmt,
+        "collections": entries,
+        "fingerprint": fingerprint(fmt, entries),
+        "created_at": datetime.utcnow().isoformat()
+    }
+    (path / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def fingerprint(fmt: str, entries: dict) -> str:
+    """Identity of a snapshot's content, independent of when it was dumped"""
+    encoded = json.dumps({"format": fmt, "collections": entries}, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def read_documents(path: Path, collection: str, fmt: str) -> Iterator[dict]:
+    with gzip.open(snapshot_file(path, collection, fmt), "rb") as source:
+        if fmt == "bson":
+            yield from bson.decode_file_iter(source)
+        else:
+            for line in source:
+                if line.strip():
+                    yield json_util.loads(line)
+
+
+def snapshot_chunks(path: Path, collection: str, fmt: str, chunk_size: int = 1000) -> Iterator[List[dict]]:
+    """Stream a collection's documents in chunks, e.g. as a StagedLoader source"""
+    chunk = []
+    for document in read_documents(path, collection, fmt):
+        chunk.append(document)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def main():
+    import argparse
+    import os
+
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    parser = argparse.ArgumentParser(description="Dump or inspect fixture snapshots")
+    commands = parser.add_subparsers(dest="command", required=True)
+    dump = commands.add_parser("dump", help="Snapshot the database named by MONGO_URL/DB_NAME")
+    dump.add_argument("path", type=Path)
+    dump.add_argument("--format", choices=FORMATS, default="bson")
+    dump.add_argument("--collections", nargs="+", default=SNAPSHOT_COLLECTIONS)
+    info = commands.add_parser("info", help="Show a snapshot's manifest")
+    info.add_argument("path", type=Path)
+    args = parser.parse_args()
+
+    if args.command == "dump":
+        load_dotenv(Path(__file__).parent / ".env")
+        client = MongoClient(os.environ["MONGO_URL"])
+        try:
+            manifest = dump_snapshot(client[os.environ["DB_NAME"]], args.path, args.collections, args.format)
+        finally:
+            client.close()
+    else:
+        manifest = load_manifest(args.path)
+    print(json.dumps(manifest, indent=2))
+
+
+if __name__ == "__main__":
+    main()
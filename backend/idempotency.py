@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+
+
+def request_fingerprint(payload: Any) -> str:
+    """Stable hash of a request payload, used to spot key reuse with other data"""
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class IdempotencyStore:
+    """Remember the outcome of keyed requests so retries replay it.
+
+    Records live in a Mongo collection with a TTL index. The first request for a
+    key claims it with an insert; duplicates on the same worker await the same
+    future, and duplicates on other workers poll the record until the owner
+    stores its response. Failed requests release the key so the client can retry.
+    """
+
+    def __init__(self, collection, ttl_hours: int = 24, lock_timeout_seconds: int = 60,
+                 wait_timeout_seconds: float = 10.0):
+        self.collection = collection
+        self.ttl = timedelta(hours=ttl_hours)
+        self.lock_timeout = timedelta(seconds=lock_timeout_seconds)
+        self.wait_timeout = wait_timeout_seconds
+        self._inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+    async def create_indexes(self):
+        await self.collection.create_index("created_at", expireAfterSeconds=int(self.ttl.total_seconds()))
+
+    async def run(self, scope: str, key: str, fingerprint: str,
+                  operation: Callable[[], Awaitable[dict]]) -> Tuple[dict, bool]:
+        """Run `operation` once per (scope, key); returns (response, replayed)"""
+        record_id = f"{scope}:{key}"
+
+        inflight = self._inflight.get(record_id)
+        if inflight:
+            self._check_fingerprint(inflight[0], fingerprint)
+            return await asyncio.shield(inflight[1]), True
+
+        while True:
+            try:
+                await self.collection.insert_one({
+                    "_id": record_id,
+                    "fingerprint": fingerprint,
+                    "status": "in_progress",
+                    "created_at": datetime.utcnow()
+                })
+                break
+            except DuplicateKeyError:
+                record = await self.collection.find_one({"_id": record_id})
+                if record is None:
+                    continue  # Released or expired in the meantime
+                self._check_fingerprint(record["fingerprint"], fingerprint)
+                if record["status"] == "completed":
+                    return record["response"], True
+                if datetime.utcnow() - record["created_at"] > self.lock_timeout:
+                    # The owner died mid-request; free the key and claim it
+                    await self.collection.delete_one({"_id": record_id, "status": "in_progress"})
+                    continue
+                return await self._wait_for_owner(record_id), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[record_id] = (fingerprint, future)
+        try:
+            response = await operation()
+        except BaseException as e:
+            await self.collection.delete_one({"_id": record_id})
+            if isinstance(e, Exception):
+                future.set_exception(e)
+            else:
+                future.set_exception(HTTPException(status_code=409, detail="The original request was aborted; retry it"))
+            future.exception()  # Mark retrieved when nobody else is waiting
+            raise
+        else:
+            await self.collection.update_one(
+                {"_id": record_id},
+                {"$set": {"status": "completed", "response": response, "completed_at": datetime.utcnow()}}
+            )
+            future.set_result(response)
+            return response, False
+        finally:
+            self._inflight.pop(record_id, None)
+
+    async def _wait_for_owner(self, record_id: str) -> dict:
+        deadline = asyncio.get_running_loop().time() + self.wait_timeout
+        delay = 0.05
+        while asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 1.0)
+            record = await self.collection.find_one({"_id": record_id})
+            if record is None:
+                break
+            if record["status"] == "completed":
+                return record["response"]
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is still being processed or failed; retry it"
+        )
+
+    @staticmethod
+    def _check_fingerprint(stored: str, fingerprint: str):
+        if stored != fingerprint:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used with a different request"
+            )
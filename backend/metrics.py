@@ -0,0 +1,143 @@
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Label for requests that matched no route, so 404 scans cannot blow up cardinality
+UNMATCHED_ROUTE = "unmatched"
+
+
+def route_template(scope: dict) -> str:
+    """Path template of the route the router matched for this request, once it has"""
+    return getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+
+
+class RequestMetrics:
+    """Per-route request counts, status codes, latency histograms and in-flight gauges.
+
+    Everything is plain dict arithmetic on the event loop thread; no locks are
+    needed and recording a request costs a few microseconds.
+
+    A request's route is only known after the router has matched it, well
+    after the request is counted as started, so in-flight requests are kept
+    by their ASGI scope and grouped by route when metrics are rendered.
+    Requests not routed yet (or matching nothing) count as unmatched.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.latency: Dict[Tuple[str, str], List[float]] = {}  # bucket counts..., +Inf, sum
+        self.in_flight: Dict[int, dict] = {}  # id(scope) -> scope
+
+    def started(self, scope: dict):
+        self.in_flight[id(scope)] = scope
+
+    def finished(self, scope: dict, status: int, seconds: float):
+        del self.in_flight[id(scope)]
+        method, route = scope["method"], route_template(scope)
+        key = (method, route, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        histogram = self.latency.get((method, route))
+        if histogram is None:
+            histogram = self.latency[(method, route)] = [0] * (len(self.buckets) + 1) + [0.0]
+        histogram[bisect_left(self.buckets, seconds)] += 1
+        histogram[-1] += seconds
+
+    def render(self) -> List[str]:
+        lines = metric_header("http_requests_total", "counter", "HTTP requests by route template and status code")
+        for (method, route, status), count in sorted(self.requests.items()):
+            lines.append(sample("http_requests_total", {"method": method, "route": route, "status": status}, count))
+
+        in_progress = {}
+        for scope in self.in_flight.values():
+            key = (scope["method"], route_template(scope))
+            in_progress[key] = in_progress.get(key, 0) + 1
+        lines += metric_header("http_requests_in_progress", "gauge", "HTTP requests being served by route template")
+        # Routes seen before report 0 rather than vanishing between requests
+        for method, route in sorted(set(self.latency) | set(in_progress)):
+            lines.append(sample(
+                "http_requests_in_progress", {"method": method, "route": route}, in_progress.get((method, route), 0)
+            ))
+
+        lines += metric_header("http_request_duration_seconds", "histogram", "HTTP request latency by route template")
+        for (method, route), histogram in sorted(self.latency.items()):
+            lines += histogram_samples(
+                "http_request_duration_seconds", {"method": method, "route": route},
+                self.buckets, histogram[:-1], histogram[-1]
+            )
+        return lines
+
+
+class MetricsMiddleware:
+    """ASGI middleware feeding RequestMetrics.
+
+    Requests are labelled with the matched route's path template (e.g.
+    /api/chat/{package_id}), which FastAPI's router leaves in the scope. The
+    router updates the scope dict it was given rather than a copy, so the
+    scope this middleware holds picks up the route as soon as it is matched.
+    """
+
+    def __init__(self, app, metrics: RequestMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        self.metrics.started(scope)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.metrics.finished(scope, status_code, time.perf_counter() - started)
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def sample(name: str, labels: Optional[dict], value) -> str:
+    if labels:
+        rendered = ",".join(f'{key}="{escape_label(label)}"' for key, label in labels.items())
+        return f"{name}{{{rendered}}} {value}"
+    return f"{name} {value}"
+
+
+def metric_header(name: str, kind: str, help_text: str) -> List[str]:
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+
+
+def metric(name: str, kind: str, help_text: str, value, labels: Optional[dict] = None) -> List[str]:
+    """A single-sample counter or gauge"""
+    return metric_header(name, kind, help_text) + [sample(name, labels, value)]
+
+
+def histogram_samples(name: str, labels: dict, bounds: Iterable[float], counts: Sequence[int],
+                      total: float) -> List[str]:
+    """Histogram series from per-bucket (non-cumulative) counts; counts[-1] is the +Inf bucket"""
+    lines = []
+    cumulative = 0
+    for bound, count in zip(bounds, counts):
+        cumulative += count
+        lines.append(sample(f"{name}_bucket", {**labels, "le": bound}, cumulative))
+    cumulative += counts[-1]
+    lines.append(sample(f"{name}_bucket", {**labels, "le": "+Inf"}, cumulative))
+    lines.append(sample(f"{name}_sum", labels, round(total, 6)))
+    lines.append(sample(f"{name}_count", labels, cumulative))
+    return lines
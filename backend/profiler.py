@@ -0,0 +1,198 @@
+import asyncio
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+
+def frame_name(frame) -> str:
+    code = frame.f_code
+    path = Path(code.co_filename)
+    name = getattr(code, "co_qualname", code.co_name)
+    # Folded stacks use ';' as the frame separator
+    return f"{name} ({path.parent.name}/{path.name}:{code.co_firstlineno})".replace(";", ":")
+
+
+def coroutine_stack(coro) -> List[str]:
+    """Logical stack of a suspended coroutine chain, outermost first, ending at what it awaits"""
+    names = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break
+        names.append(frame_name(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    if coro is not None:
+        names.append(f"[await {type(coro).__name__}]")
+    return names
+
+
+class ProfileSession:
+    def __init__(self, task: asyncio.Task, thread_id: int):
+        self.id = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+        self.task = task
+        self.thread_id = thread_id
+        self.stacks: Counter = Counter()
+        self.started = time.perf_counter()
+
+
+class SamplingProfiler:
+    """Statistical wall-clock profiler for individual requests.
+
+    One background thread samples every active session each `interval`
+    seconds. When the event loop thread is executing the session's task, the
+    sample is the thread's real stack from the task's coroutine down, which
+    covers synchronous work such as pydantic validation or the budget search.
+    When the task is suspended, the sample is its coroutine chain ending in
+    what it awaits, e.g. a Motor future while Mongo works. Profiles are
+    written as folded stacks, ready for flamegraph.pl or speedscope.
+    """
+
+    def __init__(self, output_dir: Path, interval: float = 0.005, max_profiles: int = 200):
+        self.output_dir = Path(output_dir)
+        self.interval = interval
+        self.max_profiles = max_profiles
+        self._sessions: Dict[str, ProfileSession] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def begin(self) -> ProfileSession:
+        """Start profiling the current task (call from the event loop)"""
+        session = ProfileSession(asyncio.current_task(), threading.get_ident())
+        with self._lock:
+            self._sessions[session.id] = session
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        return session
+
+    async def end(self, session: ProfileSession, label: str) -> Path:
+        """Stop profiling and write the folded stacks, each rooted at `label`"""
+        with self._lock:
+            self._sessions.pop(session.id, None)
+            stacks = list(session.stacks.items())
+        elapsed_ms = (time.perf_counter() - session.started) * 1000
+        # File I/O stays off the event loop
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self._write, session.id, label, elapsed_ms, stacks
+        )
+
+    def _write(self, profile_id: str, label: str, elapsed_ms: float, stacks: List[Tuple[Tuple[str, ...], int]]) -> Path:
+        root = label.replace(";", ":")
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = self.output_dir / f"{profile_id}.folded"
+        with open(path, "w") as out:
+            out.write(f"# {label} {elapsed_ms:.1f}ms, {sum(count for _, count in stacks)} samples "
+                      f"every {self.interval * 1000:g}ms\n")
+            for stack, count in stacks:
+                out.write(f"{';'.join((root,) + stack)} {count}\n")
+        self._prune()
+        return path
+
+    async def recent(self, limit: int) -> List[dict]:
+        """Newest profiles first, as {"id", "size"}"""
+        return await asyncio.get_running_loop().run_in_executor(None, self._recent, limit)
+
+    async def read(self, profile_id: str) -> Optional[str]:
+        """A profile's folded stacks, or None when there is no such profile"""
+        return await asyncio.get_running_loop().run_in_executor(None, self._read, profile_id)
+
+    def _recent(self, limit: int) -> List[dict]:
+        if not self.output_dir.exists():
+            return []
+        paths = sorted(self.output_dir.glob("*.folded"), reverse=True)[:limit]
+        return [{"id": path.stem, "size": path.stat().st_size} for path in paths if path.exists()]
+
+    def _read(self, profile_id: str) -> Optional[str]:
+        try:
+            return (self.output_dir / f"{profile_id}.folded").read_text()
+        except FileNotFoundError:
+            # Never written, or pruned since
+            return None
+
+    def _prune(self):
+        """Keep only the newest max_profiles files; ids start with a millisecond timestamp"""
+        profiles = sorted(self.output_dir.glob("*.folded"), reverse=True)
+        for old in profiles[self.max_profiles:]:
+            old.unlink(missing_ok=True)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._sessions:
+                    self._thread = None
+                    return
+                sessions = list(self._sessions.values())
+            frames = sys._current_frames()
+            for session in sessions:
+                stack = self._sample(session, frames.get(session.thread_id))
+                if stack:
+                    with self._lock:
+                        session.stacks[stack] += 1
+            del frames
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _sample(session: ProfileSession, thread_frame) -> Optional[Tuple[str, ...]]:
+        coro = session.task.get_coro() if session.task else None
+        root = getattr(coro, "cr_frame", None)
+        if root is None:
+            return None
+
+        # Running: the task's root frame is on the loop thread's stack
+        running = []
+        frame = thread_frame
+        while frame is not None:
+            running.append(frame)
+            if frame is root:
+                return tuple(frame_name(f) for f in reversed(running))
+            frame = frame.f_back
+
+        # Suspended: follow what the coroutine chain is waiting on
+        return tuple(coroutine_stack(coro))
+
+
+class ProfilerMiddleware:
+    """ASGI middleware profiling requests that carry `X-Profile: <token>` for a
+    token `authorize` accepts, plus a random `sample_rate` fraction of all requests.
+
+    Token-triggered responses get an X-Profile-Id header naming the profile.
+    """
+
+    def __init__(self, app, profiler: SamplingProfiler, authorize: Optional[Callable[[str], bool]] = None,
+                 sample_rate: float = 0.0):
+        self.app = app
+        self.profiler = profiler
+        self.authorize = authorize
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = dict(scope["headers"]).get(PROFILE_HEADER)
+        requested = token is not None and self.authorize is not None and self.authorize(token.decode("latin-1"))
+        if not requested and not (self.sample_rate and random.random() < self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+
+        session = self.profiler.begin()
+
+        async def send_wrapper(message):
+            if requested and message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(PROFILE_ID_HEADER, session.id.encode("ascii"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            await self.profiler.end(session, f"{scope['method']} {getattr(route, 'path', scope['path'])}")
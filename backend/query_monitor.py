@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Commands worth timing per collection; handshakes, auth and session
+# housekeeping are ignored
+IGNORED_COMMANDS = {
+    "hello", "ismaster", "isMaster", "ping", "buildinfo", "buildInfo", "saslStart", "saslContinue",
+    "endSessions", "killCursors", "explain", "listCollections", "listIndexes", "getLastError"
+}
+
+# Commands that explain() accepts, mapped to the field holding their filter
+EXPLAINABLE_COMMANDS = {
+    "find": "filter", "aggregate": "pipeline", "count": "query", "distinct": "query",
+    "update": "updates", "delete": "deletes", "findAndModify": "query"
+}
+
+# Session and transport fields that must not be sent back inside an explain
+COMMAND_ENVELOPE_FIELDS = {"lsid", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern"}
+
+
+def redact(value):
+    """The shape of a filter or update with every value replaced by '?'"""
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return "?"
+
+
+def summarize_explain(result: dict) -> dict:
+    """Index usage and scan counts from explain(executionStats) output (find or aggregate)"""
+    stages, indexes = set(), set()
+    stats = {"docs_examined": 0, "keys_examined": 0, "returned": 0}
+
+    def walk(node):
+        if isinstance(node, dict):
+            if "stage" in node:
+                stages.add(node["stage"])
+                if node.get("indexName"):
+                    indexes.add(node["indexName"])
+            execution = node.get("executionStats")
+            if isinstance(execution, dict) and "totalDocsExamined" in execution:
+                stats["docs_examined"] += execution.get("totalDocsExamined", 0)
+                stats["keys_examined"] += execution.get("totalKeysExamined", 0)
+                stats["returned"] += execution.get("nReturned", 0)
+            for key, value in node.items():
+                # Rejected plans were never run; only the winning plan matters
+                if key != "rejectedPlans":
+                    walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(result)
+    return {
+        "indexes": sorted(indexes),
+        "collection_scan": "COLLSCAN" in stages,
+        **stats
+    }
+
+
+class QueryMonitor(monitoring.CommandListener):
+    """Per-collection command latency with a slow-query log and sampled explains.
+
+    Pass it to the client through event_listeners. pymongo calls the listener
+    on Motor's worker threads, so state is guarded by a lock and explains are
+    handed to the event loop with call_soon_threadsafe; call start() from the
+    loop once the client exists.
+    """
+
+    def __init__(self, slow_ms: float = 100, explain_sample_rate: float = 0.1, max_slow_queries: int = 50):
+        self.slow_ms = slow_ms
+        self.explain_sample_rate = explain_sample_rate
+        self.slow_queries = deque(maxlen=max_slow_queries)
+        self._stats: Dict[Tuple[str, str], dict] = {}
+        self._started: Dict[Tuple, Tuple[str, str, str, dict]] = {}
+        self._explaining = set()
+        self._lock = threading.Lock()
+        self._client = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self, client):
+        """Enable explains: they run through `client` on the current event loop"""
+        self._client = client
+        self._loop = asyncio.get_running_loop()
+
+    def stop(self):
+        self._loop = None
+
+    # pymongo listener interface (called on driver threads)
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        command = event.command
+        collection = command.get("collection") if event.command_name == "getMore" else command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = "(database)"
+        with self._lock:
+            self._started[(event.connection_id, event.request_id)] = (
+                event.database_name, collection, event.command_name, command
+            )
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool):
+        with self._lock:
+            started = self._started.pop((event.connection_id, event.request_id), None)
+            if started is None:
+                return
+            database, collection, command_name, command = started
+            elapsed_ms = event.duration_micros / 1000
+            stats = self._stats.get((collection, command_name))
+            if stats is None:
+                stats = self._stats[(collection, command_name)] = {
+                    "count": 0, "errors": 0, "slow": 0, "total_ms": 0.0, "max_ms": 0.0, "documents_returned": 0
+                }
+            stats["count"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            if failed:
+                stats["errors"] += 1
+            else:
+                cursor = event.reply.get("cursor") if isinstance(event.reply, dict) else None
+                if isinstance(cursor, dict):
+                    stats["documents_returned"] += len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+            if elapsed_ms < self.slow_ms:
+                return
+            stats["slow"] += 1
+            entry = {
+                "at": time.time(),
+                "collection": collection,
+                "command": command_name,
+                "duration_ms": round(elapsed_ms, 3),
+                # Field names and operators only: filters and updates carry user data
+                # (credentials lookups, chat text); long ones are cut short
+                "filter": repr(redact(command.get(EXPLAINABLE_COMMANDS.get(command_name, ""))))[:500],
+                "failed": failed,
+                "explain": None
+            }
+            self.slow_queries.append(entry)
+
+        logger.warning(
+            f"Slow Mongo {command_name} on {collection}: {elapsed_ms:.1f}ms filter={entry['filter']}"
+        )
+        if (command_name in EXPLAINABLE_COMMANDS and not failed and self._loop is not None
+                and random.random() < self.explain_sample_rate):
+            try:
+                self._loop.call_soon_threadsafe(self._schedule_explain, database, command_name, command, entry)
+            except RuntimeError:
+                pass  # Loop closed during shutdown
+
+    # Explains (event loop)
+
+    def _schedule_explain(self, database: str, command_name: str, command: dict, entry: dict):
+        key = (entry["collection"], command_name)
+        if key in self._explaining or self._client is None:
+            return  # One explain per query shape at a time
+        pipeline = command.get("pipeline") or []
+        if any("$out" in stage or "$merge" in stage for stage in pipeline if isinstance(stage, dict)):
+            return  # Explaining with executionStats would run the write
+        self._explaining.add(key)
+        asyncio.ensure_future(self._explain(database, command, entry, key))
+
+    async def _explain(self, database: str, command: dict, entry: dict, key):
+        explained = {
+            field: value for field, value in command.items()
+            if not field.startswith("$") and field not in COMMAND_ENVELOPE_FIELDS
+        }
+        try:
+            result = await self._client[database].command(
+                {"explain": explained, "verbosity": "executionStats"}
+            )
+            entry["explain"] = summarize_explain(result)
+            logger.warning(f"Explain for slow {entry['command']} on {entry['collection']}: {entry['explain']}")
+        except Exception as e:
+            entry["explain"] = {"error": str(e)}
+        finally:
+            self._explaining.discard(key)
+
+    # Reporting
+
+    def stats(self) -> List[dict]:
+        """Per (collection, command) totals, most expensive first"""
+        with self._lock:
+            rows = [
+                {
+                    "collection": collection,
+                    "command": command_name,
+                    **stats,
+                    "total_ms": round(stats["total_ms"], 3),
+                    "max_ms": round(stats["max_ms"], 3),
+                    "avg_ms": round(stats["total_ms"] / stats["count"], 3)
+                }
+                for (collection, command_name), stats in self._stats.items()
+            ]
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
@@ -1,6 +1,8 @@
 import uuid
 import random
-from datetime import datetime
+import math
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional
 
 # Available avatar IDs (corresponds to avatar images in frontend)
 AVATAR_IDS = ['avatar1', 'avatar2', 'avatar3', 'avatar4', 'avatar5', 'avatar6', 'avatar7', 'avatar8']
@@ -173,4 +175,352 @@ def generate_comprehensive_sample_data():
             "created_at": datetime.utcnow()
         })
     
-    return agents, agent_ids
\ No newline at end of file
+    return agents, agent_ids
+
+
+# Synthetic data at load-test scale
+# ---------------------------------
+# Every record is a pure function of (seed, collection, index): each one draws
+# from its own seeded Random and ids are uuid5 values of the same triple, so
+# records can reference each other (a booking's package, a package's agent)
+# without keeping earlier records in memory, and a given seed always produces
+# byte-identical data.
+
+PLACEHOLDER_IMAGE_BASE64 = "data:image/jpeg;base64,/9j/4AAQSkZJRgABAQAAAQABAAD/2wBDAAYEBQYFBAYGBQYHBwYIChAKCgkJChQODwwQFxQYGBcUFhYaHSUfGhsjHBYWICwgIyYnKSopGR8tMC0oMCUoKSj/2wBDAQcHBwoIChMKChMoGhYaKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCj/wAARCAABAAEDASIAAhEBAxEB/8QAFQABAQAAAAAAAAAAAAAAAAAAAAv/xAAUEAEAAAAAAAAAAAAAAAAAAAAA/8QAFQEBAQAAAAAAAAAAAAAAAAAAAAX/xAAUEQEAAAAAAAAAAAAAAAAAAAAA/9oADAMBAAIRAxEAPwCdABmX/9k="
+
+# (city, latitude, longitude, population in millions) - agent locations and users
+CITIES = [
+    ("Mumbai", 19.0760, 72.8777, 20.7), ("Delhi", 28.7041, 77.1025, 19.0), ("Bangalore", 12.9716, 77.5946, 12.3),
+    ("Kolkata", 22.5726, 88.3639, 14.9), ("Chennai", 13.0827, 80.2707, 10.9), ("Hyderabad", 17.3850, 78.4867, 10.0),
+    ("Ahmedabad", 23.0225, 72.5714, 8.0), ("Pune", 18.5204, 73.8567, 6.6), ("Surat", 21.1702, 72.8311, 6.1),
+    ("Jaipur", 26.9124, 75.7873, 3.9), ("Lucknow", 26.8467, 80.9462, 3.6), ("Kanpur", 26.4499, 80.3319, 3.1),
+    ("Nagpur", 21.1458, 79.0882, 2.9), ("Indore", 22.7196, 75.8577, 2.6), ("Bhopal", 23.2599, 77.4126, 2.4),
+    ("Patna", 25.5941, 85.1376, 2.3), ("Vadodara", 22.3072, 73.1812, 2.1), ("Ludhiana", 30.9010, 75.8573, 1.9),
+    ("Agra", 27.1767, 78.0081, 1.8), ("Varanasi", 25.3176, 82.9739, 1.6), ("Coimbatore", 11.0168, 76.9558, 2.2),
+    ("Kochi", 9.9312, 76.2673, 2.1), ("Chandigarh", 30.7333, 76.7794, 1.2), ("Guwahati", 26.1445, 91.7362, 1.1),
+    ("Mysore", 12.2958, 76.6394, 1.0)
+]
+
+# (destination, latitude, longitude, relative popularity) - where packages go
+DESTINATIONS = [
+    ("Goa", 15.2993, 74.1240, 10), ("Kerala", 9.9312, 76.2673, 8), ("Jaipur", 26.9124, 75.7873, 7),
+    ("Manali", 32.2432, 77.1892, 7), ("Shimla", 31.1048, 77.1734, 6), ("Udaipur", 24.5854, 73.7125, 5),
+    ("Rishikesh", 30.0869, 78.2676, 5), ("Agra", 27.1767, 78.0081, 5), ("Varanasi", 25.3176, 82.9739, 4),
+    ("Darjeeling", 27.0410, 88.2663, 4), ("Leh", 34.1526, 77.5771, 3), ("Munnar", 10.0889, 77.0595, 3),
+    ("Ooty", 11.4102, 76.6950, 3), ("Mumbai", 19.0760, 72.8777, 4), ("Delhi", 28.7041, 77.1025, 4),
+    ("Andaman", 11.6234, 92.7265, 2), ("Mysore", 12.2958, 76.6394, 2), ("Jaisalmer", 26.9157, 70.9083, 2)
+]
+
+PACKAGE_THEMES = [
+    ("City Explorer", ["Professional Guide", "City Tour", "Local Cuisine", "Transportation"]),
+    ("Cultural Heritage", ["Historical Sites", "Museums", "Cultural Shows", "Professional Guide"]),
+    ("Adventure Trek", ["Trekking", "Camping", "Adventure Sports", "Meals"]),
+    ("Wildlife Safari", ["Jungle Safari", "Bird Watching", "Nature Walks", "Accommodation"]),
+    ("Beach Paradise", ["Beach Access", "Water Sports", "Sunset Views", "Accommodation"]),
+    ("Mountain Retreat", ["Hill Views", "Accommodation", "Bonfire", "Meals"]),
+    ("Desert Safari", ["Camel Ride", "Desert Camp", "Folk Music", "Meals"]),
+    ("Spiritual Journey", ["Temple Visits", "Meditation", "Yoga Sessions", "Accommodation"]),
+    ("Food Tour", ["Street Food", "Cooking Classes", "Local Cuisine", "Market Visits"]),
+    ("Photography Expedition", ["Photo Walks", "Scenic Spots", "Professional Guide", "Transportation"])
+]
+
+AGENT_NAME_PARTS = {
+    "travel": (["Royal", "Golden", "Himalayan", "Coastal", "Heritage", "Spice Route", "Wanderlust", "Incredible", "Sunrise", "Monsoon"],
+               ["Tours", "Travels", "Expeditions", "Holidays", "Journeys", "Adventures"]),
+    "transport": (["Swift", "City", "Highway", "Metro", "Premium", "Budget", "Express", "Comfort", "Eco", "Royal"],
+                  ["Cabs", "Rides", "Car Rentals", "Transport", "Travels", "Coaches"])
+}
+
+# (days, weight) - short breaks dominate, long tours are rare
+DURATION_MIX = [(1, 8), (2, 20), (3, 28), (4, 16), (5, 12), (6, 6), (7, 6), (10, 3), (14, 1)]
+
+# Fraction of packages with sponsored pricing and of agents on the premium tier
+SPONSORED_RATE = 0.15
+SUBSCRIBED_RATE = 0.2
+
+BOOKING_STATUS_MIX = [("confirmed", 55), ("completed", 30), ("pending", 10), ("cancelled", 5)]
+
+CHAT_LINES = {
+    "user": ["Is this package available next month?", "Can you customise the itinerary?", "Are meals included?",
+             "Is there a discount for groups?", "What is the cancellation policy?", "Can we add an extra night?"],
+    "agent": ["Yes, we have availability on those dates.", "Sure, we can adjust the itinerary for you.",
+              "Breakfast and dinner are included.", "Groups of 4 or more get 10% off.",
+              "Free cancellation up to 7 days before travel.", "An extra night costs Rs 2,500 per person."]
+}
+
+
+class SyntheticDataGenerator:
+    """Seeded generator for agents, packages, users, bookings and chat messages.
+
+    Collections are streamed as lists of at most chunk_size documents, so
+    millions of records can be written without holding them in memory.
+    Popularity is skewed: a few agents own many packages and a few packages
+    take most bookings, roughly like production traffic.
+    """
+
+    # Every user can sign in with this password
+    USER_PASSWORD = "password123"
+
+    def __init__(self, seed: int = 42, agents: int = 100, packages: int = 300, users: int = 1000,
+                 bookings: int = 2000, conversations: int = 500, messages_per_conversation: int = 6,
+                 now: Optional[datetime] = None):
+        self.seed = seed
+        self.counts = {
+            "agents": agents,
+            "packages": packages,
+            "users": users,
+            "bookings": bookings,
+            "conversations": conversations
+        }
+        self.messages_per_conversation = messages_per_conversation
+        self.now = now or datetime(2025, 1, 1)
+        self.namespace = uuid.uuid5(uuid.NAMESPACE_URL, f"sponsoredtrip-synthetic:{seed}")
+        # Agents alternate 3 travel : 2 transport by index, so package owners can
+        # be picked without generating the agents first
+        self.travel_agents = (agents // 5) * 3 + min(agents % 5, 3)
+        self._password_hash = None
+
+    # Deterministic building blocks
+
+    def _rng(self, kind: str, index: int) -> random.Random:
+        return random.Random(f"{self.seed}:{kind}:{index}")
+
+    def _id(self, kind: str, index: int) -> str:
+        return str(uuid.uuid5(self.namespace, f"{kind}:{index}"))
+
+    def _when(self, rng: random.Random, max_days_ago: int) -> datetime:
+        return (self.now - timedelta(seconds=rng.uniform(0, max_days_ago * 86400))).replace(microsecond=0)
+
+    @staticmethod
+    def _skewed_index(rng: random.Random, count: int, skew: float = 2.0) -> int:
+        """Index in [0, count) where low indices are much more likely"""
+        return min(int(count * rng.random() ** skew), count - 1)
+
+    @staticmethod
+    def _weighted(rng: random.Random, options: list):
+        return rng.choices([option for option, _ in options], weights=[weight for _, weight in options])[0]
+
+    def _travel_agent_index(self, k: int) -> int:
+        return (k // 3) * 5 + k % 3
+
+    # Single records
+
+    def agent(self, i: int) -> dict:
+        rng = self._rng("agent", i)
+        agent_type = "travel" if i % 5 < 3 else "transport"
+        city, _, _, _ = rng.choices(CITIES, weights=[city[3] for city in CITIES])[0]
+        prefixes, suffixes = AGENT_NAME_PARTS[agent_type]
+        name = f"{rng.choice(prefixes)} {rng.choice(suffixes)} {city}"
+        is_subscribed = rng.random() < SUBSCRIBED_RATE
+        return {
+            "id": self._id("agent", i),
+            "name": name,
+            "type": agent_type,
+            "description": f"{name}: trusted {agent_type} partner based in {city}",
+            "rating": round(min(5.0, max(1.0, rng.gauss(4.1, 0.45))), 1),
+            # Heavy-tailed: most agents are small, a few are very busy
+            "total_bookings": min(int(rng.paretovariate(1.3) * 15), 20000),
+            "location": city,
+            "contact_phone": f"+91-{rng.randint(7000000000, 9999999999)}",
+            "contact_email": f"agent{i}@{agent_type}.example.com",
+            "image_base64": PLACEHOLDER_IMAGE_BASE64,
+            "avatar_id": AVATAR_IDS[i % len(AVATAR_IDS)],
+            "services_offered": rng.sample(PACKAGE_THEMES[rng.randrange(len(PACKAGE_THEMES))][1], 3),
+            "is_subscribed": is_subscribed,
+            "subscription_type": "premium" if is_subscribed else "normal",
+            "is_active": True,
+            "created_at": self._when(rng, 3 * 365)
+        }
+
+    def package(self, i: int) -> dict:
+        rng = self._rng("package", i)
+        agent_index = self._travel_agent_index(self._skewed_index(rng, max(self.travel_agents, 1)))
+        destination, latitude, longitude, _ = rng.choices(DESTINATIONS, weights=[d[3] for d in DESTINATIONS])[0]
+        theme, features = PACKAGE_THEMES[rng.randrange(len(PACKAGE_THEMES))]
+        days = self._weighted(rng, DURATION_MIX)
+        # Log-normal prices: median around Rs 2,500 a day, with a long luxury tail
+        price = max(1000.0, round(math.exp(rng.gauss(math.log(2500 * days), 0.55)), -2))
+
+        package = {
+            "id": self._id("package", i),
+            "agent_id": self._id("agent", agent_index),
+            "title": f"{theme} {destination}",
+            "description": f"{days}-day {theme.lower()} experience in {destination}",
+            "price": price,
+            "original_price": None,
+            "discount_percentage": None,
+            "sponsored_price": None,
+            "is_sponsored": False,
+            "duration": f"{days} days {days - 1} nights" if days > 1 else "1 day",
+            "duration_days": days,
+            "destination": destination,
+            "image_base64": PLACEHOLDER_IMAGE_BASE64,
+            "features": features,
+            # Spread packages over ~10km around the destination
+            "latitude": round(latitude + rng.gauss(0, 0.05), 5),
+            "longitude": round(longitude + rng.gauss(0, 0.05), 5),
+            "is_active": rng.random() < 0.97,
+            "created_at": self._when(rng, 2 * 365)
+        }
+        if rng.random() < SPONSORED_RATE:
+            discount = rng.choice([10, 15, 20, 25, 30, 40, 50])
+            sponsored_price = round(price * (100 - discount) / 100, -1)
+            package.update({
+                "original_price": price,
+                "discount_percentage": discount,
+                "sponsored_price": sponsored_price,
+                "price": sponsored_price,
+                "is_sponsored": True
+            })
+        return package
+
+    def user(self, i: int) -> dict:
+        rng = self._rng("user", i)
+        return {
+            "id": self._id("user", i),
+            "username": f"user{i}",
+            "email": f"user{i}@example.com",
+            "password_hash": self.password_hash(),
+            "full_name": f"Test User {i}",
+            "avatar_id": AVATAR_IDS[rng.randrange(len(AVATAR_IDS))],
+            "created_at": self._when(rng, 2 * 365)
+        }
+
+    def booking(self, i: int) -> dict:
+        rng = self._rng("booking", i)
+        package = self.package(self._skewed_index(rng, self.counts["packages"], skew=3.0))
+        created_at = self._when(rng, 365)
+        num_persons = self._weighted(rng, [(1, 25), (2, 45), (3, 10), (4, 15), (6, 5)])
+        return {
+            "id": self._id("booking", i),
+            "user_id": self._id("user", self._skewed_index(rng, self.counts["users"], skew=1.5)),
+            "agent_id": package["agent_id"],
+            "package_id": package["id"],
+            "status": self._weighted(rng, BOOKING_STATUS_MIX),
+            "booking_date": created_at,
+            "travel_date": created_at + timedelta(days=rng.randint(3, 120)),
+            "total_amount": package["price"] * num_persons,
+            "group_id": None,
+            "package_summary": {
+                "title": package["title"],
+                "destination": package["destination"],
+                "duration_days": package["duration_days"],
+                "is_sponsored": package["is_sponsored"]
+            },
+            "created_at": created_at
+        }
+
+    def conversation(self, i: int) -> List[dict]:
+        """All messages of one user's chat about one package, oldest first"""
+        rng = self._rng("conversation", i)
+        package = self.package(self._skewed_index(rng, self.counts["packages"], skew=3.0))
+        user_id = self._id("user", rng.randrange(self.counts["users"]))
+        count = max(1, min(int(rng.expovariate(1 / self.messages_per_conversation)) + 1, 50))
+        timestamp = self._when(rng, 90)
+        messages = []
+        for n in range(count):
+            sender_type = "user" if n % 2 == 0 else "agent"
+            messages.append({
+                "id": self._id("message", i * 1000 + n),
+                "user_id": user_id,
+                "package_id": package["id"],
+                "agent_id": package["agent_id"],
+                "message": rng.choice(CHAT_LINES[sender_type]),
+                "sender_type": sender_type,
+                "timestamp": timestamp,
+                "is_read": n < count - 1
+            })
+            timestamp += timedelta(minutes=rng.randint(1, 240))
+        return messages
+
+    def password_hash(self) -> str:
+        """bcrypt hash of USER_PASSWORD with a seed-derived salt (cheap rounds)"""
+        if self._password_hash is None:
+            import bcrypt
+            alphabet = "./ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+            rng = self._rng("salt", 0)
+            # The last salt character only carries 2 bits; keep it canonical
+            salt = "".join(rng.choice(alphabet) for _ in range(21)) + "."
+            self._password_hash = bcrypt.hashpw(
+                self.USER_PASSWORD.encode('utf-8'), f"$2b$04${salt}".encode('ascii')
+            ).decode('utf-8')
+        return self._password_hash
+
+    # Streams
+
+    def _chunks(self, make, count: int, chunk_size: int) -> Iterator[List[dict]]:
+        for start in range(0, count, chunk_size):
+            yield [make(i) for i in range(start, min(start + chunk_size, count))]
+
+    def agents(self, chunk_size: int = 1000) -> Iterator[List[dict]]:
+        return self._chunks(self.agent, self.counts["agents"], chunk_size)
+
+    def packages(self, chunk_size: int = 1000) -> Iterator[List[dict]]:
+        return self._chunks(self.package, self.counts["packages"], chunk_size)
+
+    def users(self, chunk_size: int = 1000) -> Iterator[List[dict]]:
+        return self._chunks(self.user, self.counts["users"], chunk_size)
+
+    def bookings(self, chunk_size: int = 1000) -> Iterator[List[dict]]:
+        return self._chunks(self.booking, self.counts["bookings"], chunk_size)
+
+    def chat_messages(self, chunk_size: int = 1000) -> Iterator[List[dict]]:
+        chunk = []
+        for i in range(self.counts["conversations"]):
+            chunk.extend(self.conversation(i))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def collections(self, chunk_size: int = 1000) -> Iterator[tuple]:
+        """(collection name, chunk) pairs for every generated collection"""
+        for name, stream in [("agents", self.agents), ("packages", self.packages), ("users", self.users),
+                             ("bookings", self.bookings), ("chat_messages", self.chat_messages)]:
+            for chunk in stream(chunk_size):
+                yield name, chunk
+
+
+def main():
+    """Write a synthetic dataset as one (optionally gzipped) Extended JSON file per collection"""
+    import argparse
+    import gzip
+    from pathlib import Path
+    from bson import json_util
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--agents", type=int, default=100)
+    parser.add_argument("--packages", type=int, default=300)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--bookings", type=int, default=2000)
+    parser.add_argument("--conversations", type=int, default=500)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--gzip", action="store_true", help="Compress the output files")
+    args = parser.parse_args()
+
+    generator = SyntheticDataGenerator(
+        seed=args.seed, agents=args.agents, packages=args.packages, users=args.users,
+        bookings=args.bookings, conversations=args.conversations
+    )
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    files, counts = {}, {}
+    try:
+        for name, chunk in generator.collections(args.chunk_size):
+            if name not in files:
+                path = out / (f"{name}.ndjson.gz" if args.gzip else f"{name}.ndjson")
+                files[name] = gzip.open(path, "wt", encoding="utf-8") if args.gzip else open(path, "w", encoding="utf-8")
+            files[name].writelines(json_util.dumps(document) + "\n" for document in chunk)
+            counts[name] = counts.get(name, 0) + len(chunk)
+    finally:
+        for handle in files.values():
+            handle.close()
+    for name, count in counts.items():
+        print(f"{name}: {count}")
+
+
+if __name__ == "__main__":
+    main()
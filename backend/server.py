@@ -1,35 +1,99 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Query, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
 import os
 import logging
+import asyncio
 from pathlib import Path
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Optional
 import uuid
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from functools import partial
 import jwt
 import bcrypt
-from sample_data_generator import generate_comprehensive_sample_data
+from sample_data_generator import SyntheticDataGenerator, generate_comprehensive_sample_data
+from batch_loader import BatchLoader
+from idempotency import IdempotencyStore, request_fingerprint
+from write_behind import WriteBehindCounter
+from chat_hub import ChatHub
+from chat_pubsub import LATENCY_BUCKETS_MS, create_chat_broker
+from chat_archive import ChatArchive
+from bulk_loader import StagedLoader
+from fixtures import MUTABLE_COLLECTIONS, load_manifest, snapshot_chunks
+from query_monitor import QueryMonitor
+from profiler import ProfilerMiddleware, SamplingProfiler
+from metrics import CONTENT_TYPE, MetricsMiddleware, RequestMetrics, histogram_samples, metric, metric_header, sample
 import json
 import re
 import math
+import base64
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection, with per-collection command timing and a slow-query log
+query_monitor = QueryMonitor(
+    slow_ms=float(os.environ.get('MONGO_SLOW_QUERY_MS', '100')),
+    explain_sample_rate=float(os.environ.get('MONGO_EXPLAIN_SAMPLE_RATE', '0.1'))
+)
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[query_monitor])
 db = client[os.environ['DB_NAME']]
 
+# Batched id lookups for hot read paths
+package_loader = BatchLoader(db.packages)
+
+# Stored outcomes of Idempotency-Key requests
+IDEMPOTENCY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_TTL_HOURS', '24'))
+idempotency_store = IdempotencyStore(db.idempotency_keys, ttl_hours=IDEMPOTENCY_TTL_HOURS)
+
 # JWT Configuration
 SECRET_KEY = "travel_app_secret_key_2024"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Operator token for the /api/admin routes (X-Admin-Token); they answer 404 while unset
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Background job intervals
+RIBBON_REFRESH_SECONDS = int(os.environ.get('RIBBON_REFRESH_SECONDS', '300'))
+BOOKING_COUNTER_FLUSH_SECONDS = float(os.environ.get('BOOKING_COUNTER_FLUSH_SECONDS', '5'))
+CHAT_COMPACTION_SECONDS = int(os.environ.get('CHAT_COMPACTION_SECONDS', '3600'))
+
+# How long a new chat WebSocket may take to send its auth frame
+CHAT_AUTH_TIMEOUT_SECONDS = float(os.environ.get('CHAT_AUTH_TIMEOUT_SECONDS', '10'))
+
+# Agent total_bookings/rank_score are updated write-behind, batched per agent
+booking_counters = WriteBehindCounter(
+    db.agents, "id",
+    lambda count: agent_activity_update(count),
+    flush_interval=BOOKING_COUNTER_FLUSH_SECONDS
+)
+
+# Chat retention: messages stay in chat_messages for CHAT_HOT_RETENTION_DAYS,
+# then move into bucketed chat_archive documents kept for CHAT_ARCHIVE_TTL_DAYS
+# (0 keeps them forever)
+chat_archive = ChatArchive(
+    db.chat_messages, db.chat_archive,
+    hot_retention_days=int(os.environ.get('CHAT_HOT_RETENTION_DAYS', '30')),
+    ttl_days=int(os.environ.get('CHAT_ARCHIVE_TTL_DAYS', '365')),
+    bucket_size=int(os.environ.get('CHAT_ARCHIVE_BUCKET_SIZE', '100'))
+)
+
+# /api/init-data reseeds through staging collections swapped in when loaded
+INIT_DATA_CHUNK_SIZE = int(os.environ.get('INIT_DATA_CHUNK_SIZE', '1000'))
+MAX_SEED_RECORDS = 5_000_000
+# Fixture snapshots restorable with /api/init-data?snapshot=<name>, see fixtures.py
+FIXTURES_DIR = Path(os.environ.get('FIXTURES_DIR', ROOT_DIR / 'fixtures'))
+seed_loader = StagedLoader(db, chunk_size=INIT_DATA_CHUNK_SIZE,
+                           concurrency=int(os.environ.get('INIT_DATA_CONCURRENCY', '4')))
+
 # Create the main app without a prefix
 app = FastAPI()
 
@@ -47,6 +111,7 @@ class User(BaseModel):
     password_hash: str
     full_name: str
     avatar_id: str = "avatar1"  # Default avatar for user profiles
+    agent_id: Optional[str] = None  # Set for staff accounts that answer chats for an agent
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class UserCreate(BaseModel):
@@ -55,6 +120,9 @@ class UserCreate(BaseModel):
     password: str
     full_name: str
 
+class StaffLinkRequest(BaseModel):
+    agent_id: Optional[str] = None  # None turns a staff account back into a customer one
+
 class UserLogin(BaseModel):
     username: str
     password: str
@@ -79,6 +147,7 @@ class Agent(BaseModel):
     services_offered: List[str] = []
     is_subscribed: bool = False  # New field for subscription status
     subscription_type: str = "normal"  # "normal" or "premium"
+    rank_score: float = 0.0  # Feed ranking, see calculate_rank_score
     is_active: bool = True
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -98,10 +167,45 @@ class Package(BaseModel):
     features: List[str]
     latitude: Optional[float] = None
     longitude: Optional[float] = None
+    geo_location: Optional[dict] = None  # GeoJSON Point mirroring latitude/longitude
     is_sponsored: bool = False  # Whether this package has sponsored pricing
+    daily_capacity: Optional[int] = None  # Seats sold per travel date; None means unlimited
     is_active: bool = True
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class PackageCreate(BaseModel):
+    agent_id: str
+    title: str
+    description: str
+    price: float
+    original_price: Optional[float] = None
+    discount_percentage: Optional[float] = None
+    sponsored_price: Optional[float] = None
+    duration: str
+    duration_days: int = 0
+    destination: str
+    image_base64: str = ""
+    features: List[str] = []
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    is_sponsored: bool = False
+    daily_capacity: Optional[int] = Field(None, ge=0)
+    is_active: bool = True
+
+    @model_validator(mode="after")
+    def normalize_duration_days(self):
+        # Budget search filters on duration_days, so it must be set at write time
+        if self.duration_days < 0:
+            raise ValueError("duration_days must be positive")
+        if self.duration_days == 0:
+            if not re.search(r'\d+', self.duration):
+                raise ValueError("duration must include the number of days, e.g. '3 days 2 nights'")
+            self.duration_days = parse_duration_to_days(self.duration)
+        return self
+
+class NearbyPackage(Package):
+    distance_km: float
+
 class RibbonContent(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     title: str
@@ -119,6 +223,8 @@ class Booking(BaseModel):
     booking_date: datetime
     travel_date: datetime
     total_amount: float
+    group_id: Optional[str] = None  # Shared by bookings made in one bulk request
+    package_summary: Optional[dict] = None  # Denormalized at booking time, see package_summary()
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class BudgetTravelRequest(BaseModel):
@@ -141,6 +247,44 @@ class BudgetTravelResponse(BaseModel):
     total_combinations_found: int
     message: str
 
+class BookingItem(BaseModel):
+    package_id: str
+    travel_date: datetime
+
+class BulkBookingRequest(BaseModel):
+    items: List[BookingItem] = []  # Explicit package/date pairs...
+    combination: Optional[PackageCombination] = None  # ...or a budget-travel result
+    travel_date: Optional[datetime] = None  # Start date when booking a combination
+    num_persons: int = Field(1, ge=1, le=50)
+
+    @model_validator(mode="after")
+    def check_source(self):
+        if bool(self.items) == bool(self.combination):
+            raise ValueError("Provide either items or combination")
+        if self.combination and not self.travel_date:
+            raise ValueError("travel_date is required when booking a combination")
+        if self.combination:
+            for package in self.combination.packages:
+                if not isinstance(package.get("id"), str):
+                    raise ValueError("Every combination package needs an id")
+                # Missing, null or zero durations still occupy one day
+                try:
+                    package["duration_days"] = max(1, int(package.get("duration_days") or 1))
+                except (TypeError, ValueError):
+                    raise ValueError("duration_days must be a whole number of days")
+        return self
+
+    def booking_items(self) -> List[BookingItem]:
+        """Explicit items, or the combination's packages scheduled back to back"""
+        if self.items:
+            return self.items
+        items = []
+        travel_date = self.travel_date
+        for package in self.combination.packages:
+            items.append(BookingItem(package_id=package["id"], travel_date=travel_date))
+            travel_date += timedelta(days=package["duration_days"])
+        return items
+
 class ChatMessage(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
@@ -155,6 +299,32 @@ class ChatRequest(BaseModel):
     package_id: str
     message: str
 
+class AgentReplyRequest(BaseModel):
+    message: str
+
+class Conversation(BaseModel):
+    id: str
+    package_id: str
+    user_id: str
+    agent_id: str
+    last_message: dict
+    last_message_at: datetime
+    message_count: int = 0
+    unread_count: int = 0  # Messages from the other side the reader has not seen
+    package_summary: Optional[dict] = None
+
+class SearchResult(BaseModel):
+    kind: str  # "package" or "agent"
+    score: float
+    item: dict
+
+class SearchResponse(BaseModel):
+    query: str
+    page: int
+    page_size: int
+    total: int
+    results: List[SearchResult]
+
 # Helper Functions
 def hash_password(password: str) -> str:
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
@@ -193,6 +363,58 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     
     return distance
 
+# Agent ranking: rating dominates, bookings add a diminishing boost and premium
+# subscribers get a fixed bump. calculate_rank_score and RANK_SCORE_EXPRESSION
+# must stay in step; the expression lets Mongo recompute the score in place.
+RANK_RATING_WEIGHT = 20
+RANK_BOOKINGS_WEIGHT = 10
+RANK_TIER_BONUS = {"premium": 25}
+
+def calculate_rank_score(agent: dict) -> float:
+    score = (
+        agent.get("rating", 0) * RANK_RATING_WEIGHT
+        + math.log1p(agent.get("total_bookings", 0)) * RANK_BOOKINGS_WEIGHT
+        + RANK_TIER_BONUS.get(agent.get("subscription_type"), 0)
+    )
+    return round(score, 4)
+
+RANK_SCORE_EXPRESSION = {"$round": [{"$add": [
+    {"$multiply": [{"$ifNull": ["$rating", 0]}, RANK_RATING_WEIGHT]},
+    {"$multiply": [{"$ln": {"$add": [1, {"$ifNull": ["$total_bookings", 0]}]}}, RANK_BOOKINGS_WEIGHT]},
+    {"$switch": {
+        "branches": [
+            {"case": {"$eq": ["$subscription_type", tier]}, "then": bonus}
+            for tier, bonus in RANK_TIER_BONUS.items()
+        ],
+        "default": 0
+    }}
+]}, 4]}
+
+def package_summary(package: dict) -> dict:
+    """Compact package fields shown next to a booking"""
+    return {
+        "title": package["title"],
+        "destination": package["destination"],
+        "duration_days": package.get("duration_days"),
+        "is_sponsored": package.get("is_sponsored", False)
+    }
+
+def encode_cursor(timestamp: datetime, item_id: str) -> str:
+    """Opaque keyset cursor for (timestamp, id) ordered listings"""
+    raw = json.dumps([timestamp.isoformat(), item_id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str):
+    try:
+        timestamp, item_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(timestamp), item_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def geo_point(lat: float, lon: float) -> dict:
+    """Build a GeoJSON Point (note GeoJSON orders coordinates lon, lat)"""
+    return {"type": "Point", "coordinates": [lon, lat]}
+
 def calculate_transport_cost(distance_km: float, transport_type: str = "taxi") -> float:
     """Calculate transport cost based on distance and type"""
     rates = {
@@ -203,6 +425,20 @@ def calculate_transport_cost(distance_km: float, transport_type: str = "taxi") -
     rate = rates.get(transport_type, rates["other"])
     return distance_km * rate
 
+async def get_catalog_version() -> int:
+    """Current catalog version, bumped on every agent/package write"""
+    meta = await db.catalog_meta.find_one({"_id": "catalog"})
+    return meta["version"] if meta else 0
+
+async def bump_catalog_version() -> int:
+    meta = await db.catalog_meta.find_one_and_update(
+        {"_id": "catalog"},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return meta["version"]
+
 async def load_location_data():
     """Load location data from JSON file"""
     try:
@@ -220,8 +456,8 @@ async def find_budget_combinations(
     """Find optimal package combinations within budget and days"""
     combinations = []
     
-    # Get all active travel packages
-    query = {"is_active": True}
+    # Get all active travel packages that fit in the trip
+    query = {"is_active": True, "duration_days": {"$gte": 1, "$lte": num_days}}
     
     # Filter by place if specified
     if place_filter:
@@ -229,12 +465,9 @@ async def find_budget_combinations(
     
     packages = await db.packages.find(query).to_list(200)
     
-    # Parse package durations and calculate total costs
+    # Calculate total costs
     valid_packages = []
     for package in packages:
-        if 'duration_days' not in package or package['duration_days'] == 0:
-            package['duration_days'] = parse_duration_to_days(package['duration'])
-        
         total_cost = package['price'] * num_persons
         if total_cost <= budget and package['duration_days'] <= num_days:
             package['total_cost'] = total_cost
@@ -320,9 +553,162 @@ async def find_budget_combinations(
     
     return combinations[:8]  # Return top 8 combinations
 
+async def create_indexes():
+    """Create the indexes the query paths rely on"""
+    await db.packages.create_index("id", unique=True)
+    await db.agents.create_index("id", unique=True)
+    # Text indexes backing /api/search (one text index per collection)
+    await db.packages.create_index(
+        [("title", "text"), ("destination", "text"), ("features", "text"), ("description", "text")],
+        weights={"title": 10, "destination": 8, "features": 4, "description": 2},
+        name="packages_text_search"
+    )
+    await db.agents.create_index(
+        [("name", "text"), ("services_offered", "text"), ("location", "text"), ("description", "text")],
+        weights={"name": 10, "services_offered": 6, "location": 4, "description": 2},
+        name="agents_text_search"
+    )
+    await db.packages.create_index([("geo_location", "2dsphere")])
+    await db.packages.create_index([("is_active", 1), ("price", 1)])
+    await db.bookings.create_index("created_at")
+    await db.bookings.create_index([("user_id", 1), ("created_at", -1), ("id", -1)])
+    await idempotency_store.create_indexes()
+    await db.package_inventory.create_index([("package_id", 1), ("date", 1)], unique=True)
+    await db.chat_messages.create_index([("package_id", 1), ("user_id", 1), ("timestamp", 1), ("id", 1)])
+    await chat_archive.create_indexes()
+    await db.chat_conversations.create_index([("user_id", 1), ("last_message_at", -1), ("_id", -1)])
+    await db.chat_conversations.create_index([("agent_id", 1), ("last_message_at", -1), ("_id", -1)])
+    # Ranked feeds; id is included so top-N id lookups are covered by the index
+    await db.agents.create_index([("is_active", 1), ("rank_score", -1), ("id", 1)])
+    await db.agents.create_index([("is_active", 1), ("type", 1), ("rank_score", -1), ("id", 1)])
+    await db.agents.create_index([("is_active", 1), ("is_subscribed", 1), ("rank_score", -1), ("id", 1)])
+
+async def backfill_agent_rank_scores():
+    """Score agents written before ranking existed"""
+    await db.agents.update_many(
+        {"rank_score": {"$exists": False}},
+        [{"$set": {"rank_score": RANK_SCORE_EXPRESSION}}]
+    )
+
+def agent_activity_update(new_bookings: int) -> list:
+    """Pipeline update folding new bookings into an agent and re-ranking it"""
+    return [
+        {"$set": {"total_bookings": {"$add": [{"$ifNull": ["$total_bookings", 0]}, new_bookings]}}},
+        {"$set": {"rank_score": RANK_SCORE_EXPRESSION}}
+    ]
+
+def agent_feed_query(agent_type: Optional[str] = None) -> dict:
+    query = {"is_active": True}
+    if agent_type:
+        if agent_type == "sponsored":
+            # Filter by subscription status for sponsored agents
+            query["is_subscribed"] = True
+        else:
+            # Filter by agent type for travel/transport
+            query["type"] = agent_type
+    return query
+
+async def get_top_agent_ids(agent_type: Optional[str] = None, limit: int = 10) -> List[str]:
+    """Ids of the top ranked agents for a feed, read from the index alone"""
+    ranked = await db.agents.find(
+        agent_feed_query(agent_type), {"_id": 0, "id": 1, "rank_score": 1}
+    ).sort("rank_score", -1).limit(limit).to_list(limit)
+    return [agent["id"] for agent in ranked]
+
+async def backfill_package_geo_locations():
+    """Derive geo_location for packages written before it existed"""
+    await db.packages.update_many(
+        {
+            "geo_location": None,
+            "latitude": {"$type": "number"},
+            "longitude": {"$type": "number"}
+        },
+        [{"$set": {"geo_location": {"type": "Point", "coordinates": ["$longitude", "$latitude"]}}}]
+    )
+
+async def backfill_duration_days(batch_size: int = 500) -> int:
+    """Set duration_days on packages written before it was normalized.
+    
+    Runs in batches of bulk writes and checkpoints the last processed _id in the
+    migrations collection, so an interrupted run resumes where it stopped.
+    """
+    state = await db.migrations.find_one({"_id": "duration_days_backfill"}) or {}
+    last_id = state.get("last_id")
+    updated = 0
+    
+    while True:
+        query = {"$nor": [{"duration_days": {"$gte": 1}}]}  # missing, null, 0 or invalid
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await db.packages.find(query, {"_id": 1, "duration": 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        
+        await db.packages.bulk_write([
+            UpdateOne({"_id": package["_id"]}, {"$set": {"duration_days": parse_duration_to_days(package.get("duration") or "")}})
+            for package in batch
+        ], ordered=False)
+        last_id = batch[-1]["_id"]
+        updated += len(batch)
+        await db.migrations.update_one(
+            {"_id": "duration_days_backfill"},
+            {"$set": {"last_id": last_id, "updated_at": datetime.utcnow()}, "$inc": {"updated": len(batch)}},
+            upsert=True
+        )
+    
+    # The checkpoint only resumes an interrupted pass. Once a pass completes it
+    # is cleared, since reseeds and fixture restores can bring back documents
+    # with _ids below it.
+    await db.migrations.update_one(
+        {"_id": "duration_days_backfill"},
+        {"$unset": {"last_id": ""}, "$set": {"completed_at": datetime.utcnow()}},
+        upsert=True
+    )
+    if updated:
+        logger.info(f"Backfilled duration_days on {updated} packages")
+    return updated
+
+async def backfill_chat_conversations():
+    """Build conversation summaries for chat history written before they existed"""
+    if await db.migrations.find_one({"_id": "chat_conversations_backfill"}):
+        return
+    groups = await db.chat_messages.aggregate([
+        {"$sort": {"timestamp": 1, "id": 1}},
+        {"$group": {
+            "_id": {"package_id": "$package_id", "user_id": "$user_id"},
+            "agent_id": {"$last": "$agent_id"},
+            "last_message": {"$last": {"id": "$id", "message": "$message", "sender_type": "$sender_type", "timestamp": "$timestamp"}},
+            "last_message_at": {"$last": "$timestamp"},
+            "message_count": {"$sum": 1},
+            "unread_by_user": {"$sum": {"$cond": [{"$and": [{"$eq": ["$sender_type", "agent"]}, {"$ne": ["$is_read", True]}]}, 1, 0]}},
+            "unread_by_agent": {"$sum": {"$cond": [{"$and": [{"$eq": ["$sender_type", "user"]}, {"$ne": ["$is_read", True]}]}, 1, 0]}}
+        }}
+    ]).to_list(None)
+    if groups:
+        # $setOnInsert leaves conversations that live traffic already created alone
+        await db.chat_conversations.bulk_write([
+            UpdateOne(
+                {"_id": conversation_id(group["_id"]["package_id"], group["_id"]["user_id"])},
+                {"$setOnInsert": {**group["_id"], **{key: value for key, value in group.items() if key != "_id"}}},
+                upsert=True
+            )
+            for group in groups
+        ], ordered=False)
+        logger.info(f"Backfilled {len(groups)} chat conversation summaries")
+    await db.migrations.insert_one({"_id": "chat_conversations_backfill", "completed_at": datetime.utcnow()})
+
+async def run_startup_backfills():
+    if await backfill_duration_days():
+        await rebuild_budget_preview()
+        await bump_catalog_version()
+    await backfill_chat_conversations()
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await user_from_token(credentials.credentials)
+
+async def user_from_token(token: str) -> dict:
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise HTTPException(status_code=401, detail="Invalid token")
@@ -334,6 +720,19 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def get_current_agent(current_user: dict = Depends(get_current_user)):
+    """Staff account acting for an agent"""
+    if not current_user.get("agent_id"):
+        raise HTTPException(status_code=403, detail="Agent account required")
+    return current_user
+
+def is_admin(x_admin_token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and x_admin_token == ADMIN_TOKEN
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None, alias="X-Admin-Token")):
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=404, detail="Not found")
+
 # Authentication Routes
 @api_router.post("/auth/register", response_model=Token)
 async def register(user_data: UserCreate):
@@ -387,19 +786,32 @@ async def get_me(current_user: dict = Depends(get_current_user)):
         del current_user["password_hash"]
     return current_user
 
+# Staff Provisioning
+@api_router.put("/admin/staff/{username}", dependencies=[Depends(require_admin_token)])
+async def set_staff_agent(username: str, request: StaffLinkRequest):
+    """Make a registered user a staff account answering chats for an agent.
+    
+    Staff accounts sign in as usual and use the /agent routes and agent
+    replies over the chat WebSocket. Send agent_id null to unlink.
+    """
+    if request.agent_id and not await db.agents.find_one({"id": request.agent_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Agent not found")
+    
+    user = await db.users.find_one_and_update(
+        {"username": username},
+        {"$set": {"agent_id": request.agent_id}},
+        projection={"_id": 0, "password_hash": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
 # Agent Routes
 @api_router.get("/agents", response_model=List[Agent])
-async def get_agents(agent_type: Optional[str] = None):
-    query = {"is_active": True}
-    if agent_type:
-        if agent_type == "sponsored":
-            # Filter by subscription status for sponsored agents
-            query["is_subscribed"] = True
-        else:
-            # Filter by agent type for travel/transport
-            query["type"] = agent_type
-    
-    agents = await db.agents.find(query).to_list(100)
+async def get_agents(agent_type: Optional[str] = None, limit: int = Query(100, ge=1, le=100)):
+    # Highest ranked first, served by the (is_active, ..., rank_score) indexes
+    agents = await db.agents.find(agent_feed_query(agent_type)).sort("rank_score", -1).limit(limit).to_list(limit)
     return [Agent(**agent) for agent in agents]
 
 @api_router.get("/agents/{agent_id}", response_model=Agent)
@@ -419,48 +831,544 @@ async def get_packages(agent_id: Optional[str] = None):
     packages = await db.packages.find(query).to_list(100)
     return [Package(**package) for package in packages]
 
+@api_router.get("/packages/nearby", response_model=List[NearbyPackage])
+async def get_nearby_packages(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(50, gt=0, le=2000),
+    limit: int = Query(50, ge=1, le=100)
+):
+    """Get active packages within radius_km of a point, nearest first"""
+    packages = await db.packages.aggregate([
+        {
+            "$geoNear": {
+                "near": geo_point(lat, lon),
+                "distanceField": "distance_m",
+                "maxDistance": radius_km * 1000,
+                "query": {"is_active": True},
+                "spherical": True
+            }
+        },
+        {"$limit": limit}
+    ]).to_list(limit)
+    
+    return [
+        NearbyPackage(**package, distance_km=round(package["distance_m"] / 1000, 3))
+        for package in packages
+    ]
+
 @api_router.get("/packages/{package_id}", response_model=Package)
 async def get_package(package_id: str):
-    package = await db.packages.find_one({"id": package_id})
+    package = await package_loader.load(package_id)
     if not package:
         raise HTTPException(status_code=404, detail="Package not found")
     return Package(**package)
 
+async def save_package(package: Package, previous: Optional[dict] = None):
+    """Write a package and keep derived catalog data in step with it"""
+    if package.latitude is not None and package.longitude is not None:
+        package.geo_location = geo_point(package.latitude, package.longitude)
+    else:
+        package.geo_location = None
+    
+    if previous:
+        await db.packages.replace_one({"id": package.id}, package.dict())
+    else:
+        await db.packages.insert_one(package.dict())
+    
+    await update_budget_preview(previous, package.dict())
+    await bump_catalog_version()
+
+@api_router.post("/packages", response_model=Package)
+async def create_package(package_data: PackageCreate, current_agent: dict = Depends(get_current_agent)):
+    # Staff may only list packages for the agent they work for
+    if package_data.agent_id != current_agent["agent_id"]:
+        raise HTTPException(status_code=403, detail="Packages can only be created for your own agent")
+    if not await db.agents.find_one({"id": package_data.agent_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Agent not found")
+    
+    package = Package(**package_data.dict())
+    await save_package(package)
+    return package
+
+@api_router.put("/packages/{package_id}", response_model=Package)
+async def update_package(
+    package_id: str,
+    package_data: PackageCreate,
+    current_agent: dict = Depends(get_current_agent)
+):
+    previous = await db.packages.find_one({"id": package_id})
+    if not previous:
+        raise HTTPException(status_code=404, detail="Package not found")
+    if previous["agent_id"] != current_agent["agent_id"]:
+        raise HTTPException(status_code=403, detail="Packages can only be changed by their own agent")
+    if package_data.agent_id != previous["agent_id"]:
+        raise HTTPException(status_code=400, detail="A package cannot be moved to another agent")
+    
+    package = Package(**package_data.dict(), id=package_id, created_at=previous["created_at"])
+    await save_package(package, previous)
+    return package
+
+# Search Routes
+SEARCH_MAX_RESULTS = 1000  # Deepest result a page may reach
+
+async def text_search(collection, q: str, limit: int):
+    """Return (total, top `limit` active documents ranked by text score)"""
+    query = {"$text": {"$search": q}, "is_active": True}
+    total = await collection.count_documents(query)
+    documents = await collection.find(
+        query, {"score": {"$meta": "textScore"}}
+    ).sort([("score", {"$meta": "textScore"})]).limit(limit).to_list(limit)
+    return total, documents
+
+@api_router.get("/search", response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    kind: Optional[str] = Query(None, pattern="^(package|agent)$"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=50)
+):
+    """Rank packages and agents by relevance to a free-text query"""
+    depth = page * page_size
+    if depth > SEARCH_MAX_RESULTS:
+        raise HTTPException(status_code=400, detail=f"Search results are limited to the first {SEARCH_MAX_RESULTS} matches")
+    
+    # Each collection contributes at most `depth` hits; merging those by score
+    # gives the exact top `depth` overall.
+    total = 0
+    results = []
+    if kind in (None, "package"):
+        count, packages = await text_search(db.packages, q, depth)
+        total += count
+        results += [SearchResult(kind="package", score=pkg.pop("score"), item=Package(**pkg).dict()) for pkg in packages]
+    if kind in (None, "agent"):
+        count, agents = await text_search(db.agents, q, depth)
+        total += count
+        results += [SearchResult(kind="agent", score=agent.pop("score"), item=Agent(**agent).dict()) for agent in agents]
+    
+    results.sort(key=lambda x: x.score, reverse=True)
+    start = (page - 1) * page_size
+    return SearchResponse(
+        query=q,
+        page=page,
+        page_size=page_size,
+        total=total,
+        results=results[start:start + page_size]
+    )
+
+# Facet Routes
+DURATION_BUCKETS = [1, 3, 5, 8, 15]  # days, lower bound inclusive
+PRICE_BUCKETS = [0, 5000, 10000, 20000, 50000]  # ₹ per person, lower bound inclusive
+
+# Facet counts only change with the catalog, so cache them per catalog version
+facets_cache = {"version": None, "facets": None}
+
+def format_buckets(buckets: list, boundaries: list) -> List[dict]:
+    counts = {bucket["_id"]: bucket["count"] for bucket in buckets}
+    ranges = list(zip(boundaries, boundaries[1:] + [None]))
+    return [
+        {"min": low, "max": high, "count": counts.get(low, 0)}
+        for low, high in ranges
+    ]
+
+async def compute_facets() -> dict:
+    """Count agents and packages per browse facet in a single aggregation"""
+    pipeline = [
+        {"$match": {"is_active": True}},
+        {"$project": {"_id": 0, "kind": {"$literal": "agent"}, "type": 1, "is_subscribed": 1}},
+        {"$unionWith": {
+            "coll": "packages",
+            "pipeline": [
+                {"$match": {"is_active": True}},
+                {"$project": {"_id": 0, "kind": {"$literal": "package"}, "destination": 1, "duration_days": 1, "price": 1}}
+            ]
+        }},
+        {"$facet": {
+            "agent_type": [
+                {"$match": {"kind": "agent"}},
+                {"$sortByCount": "$type"}
+            ],
+            "subscription_status": [
+                {"$match": {"kind": "agent"}},
+                {"$sortByCount": "$is_subscribed"}
+            ],
+            "destination": [
+                {"$match": {"kind": "package"}},
+                {"$sortByCount": "$destination"}
+            ],
+            "duration_days": [
+                {"$match": {"kind": "package"}},
+                {"$bucket": {"groupBy": "$duration_days", "boundaries": DURATION_BUCKETS + [10 ** 6], "default": "overflow"}}
+            ],
+            "price": [
+                {"$match": {"kind": "package"}},
+                {"$bucket": {"groupBy": "$price", "boundaries": PRICE_BUCKETS + [10 ** 12], "default": "overflow"}}
+            ]
+        }}
+    ]
+    result = (await db.agents.aggregate(pipeline).to_list(1))[0]
+    
+    return {
+        "agent_type": [{"value": f["_id"], "count": f["count"]} for f in result["agent_type"]],
+        "subscription_status": [
+            {"value": "subscribed" if f["_id"] else "normal", "count": f["count"]}
+            for f in result["subscription_status"]
+        ],
+        "destination": [{"value": f["_id"], "count": f["count"]} for f in result["destination"]],
+        "duration_days": format_buckets(result["duration_days"], DURATION_BUCKETS),
+        "price": format_buckets(result["price"], PRICE_BUCKETS)
+    }
+
+@api_router.get("/facets")
+async def get_facets():
+    """Get browse filter counts for the home screen ribbon"""
+    version = await get_catalog_version()
+    if facets_cache["version"] != version:
+        facets = await compute_facets()
+        facets_cache.update(version=version, facets=facets)
+    return {"catalog_version": version, **facets_cache["facets"]}
+
 # Ribbon Content Routes
+RECOMMENDED_RIBBON_SIZE = 6
+RECENT_ACTIVITY_DAYS = 7
+RECENT_BOOKING_WEIGHT = 15  # rank boost per ln(1 + bookings in the activity window)
+
+# Ribbons change only when the refresh job or a reseed rewrites them, so
+# get_ribbons serves this copy between refreshes. Like facets_cache it is
+# keyed on the catalog version, so every worker reloads after a reseed.
+ribbons_cache = {"version": None, "ribbons": None}
+
+async def compute_recommended_items() -> List[dict]:
+    """Pick the Recommended ribbon from agent rankings and recent bookings"""
+    candidate_ids = await get_top_agent_ids("sponsored", RECOMMENDED_RIBBON_SIZE * 5)
+    
+    since = datetime.utcnow() - timedelta(days=RECENT_ACTIVITY_DAYS)
+    recent = await db.bookings.aggregate([
+        {"$match": {"created_at": {"$gte": since}}},
+        {"$group": {"_id": "$agent_id", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1}},
+        {"$limit": RECOMMENDED_RIBBON_SIZE * 5}
+    ]).to_list(RECOMMENDED_RIBBON_SIZE * 5)
+    recent_bookings = {activity["_id"]: activity["count"] for activity in recent}
+    
+    candidates = await db.agents.find({
+        "id": {"$in": list(set(candidate_ids) | set(recent_bookings))},
+        "is_active": True,
+        "is_subscribed": True
+    }).to_list(None)
+    candidates.sort(
+        key=lambda agent: agent.get("rank_score", 0) + RECENT_BOOKING_WEIGHT * math.log1p(recent_bookings.get(agent["id"], 0)),
+        reverse=True
+    )
+    
+    return [
+        {
+            "agent_id": agent['id'],
+            "name": agent['name'],
+            "type": agent['type'],
+            "rating": agent['rating'],
+            "location": agent['location']
+        }
+        for agent in candidates[:RECOMMENDED_RIBBON_SIZE]
+    ]
+
+async def load_ribbons(version: Optional[int] = None) -> List[RibbonContent]:
+    # Read the version first: a bump while loading then forces another reload
+    if version is None:
+        version = await get_catalog_version()
+    ribbons = await db.ribbons.find({"is_active": True}).sort("order", 1).to_list(100)
+    ribbons_cache.update(version=version, ribbons=[RibbonContent(**ribbon) for ribbon in ribbons])
+    return ribbons_cache["ribbons"]
+
+async def refresh_recommended_ribbon():
+    """Recompute the Recommended ribbon and swap it in with one document update"""
+    items = await compute_recommended_items()
+    await db.ribbons.update_one(
+        {"type": "recommendation"},
+        {"$set": {"items": items, "refreshed_at": datetime.utcnow()}}
+    )
+    await load_ribbons()
+
+async def ribbon_refresh_job():
+    while True:
+        try:
+            await refresh_recommended_ribbon()
+        except Exception:
+            logger.exception("Recommended ribbon refresh failed")
+        await asyncio.sleep(RIBBON_REFRESH_SECONDS)
+
 @api_router.get("/ribbons", response_model=List[RibbonContent])
 async def get_ribbons():
-    ribbons = await db.ribbons.find({"is_active": True}).sort("order", 1).to_list(100)
-    return [RibbonContent(**ribbon) for ribbon in ribbons]
+    version = await get_catalog_version()
+    if ribbons_cache["version"] != version:
+        return await load_ribbons(version)
+    return ribbons_cache["ribbons"]
+
+# Inventory: one counter document per (package, travel date), created on first
+# booking. Seats are taken with a single conditional $inc, so concurrent bookings
+# for the same hot package never oversell and never wait on a lock.
+SPONSORED_DAILY_CAPACITY = 20
+MAX_AVAILABILITY_DAYS = 92
+MAX_AVAILABILITY_PACKAGES = 50
+
+def inventory_key(package_id: str, travel_date) -> dict:
+    return {"package_id": package_id, "date": travel_date.strftime("%Y-%m-%d")}
+
+async def reserve_inventory(package: dict, travel_date: datetime, seats: int = 1) -> bool:
+    """Atomically take seats on a travel date; False when it is sold out"""
+    capacity = package.get("daily_capacity")
+    if capacity is None:
+        return True
+    if seats > capacity:
+        return False
+    
+    query = {**inventory_key(package["id"], travel_date), "booked": {"$lte": capacity - seats}}
+    update = {"$inc": {"booked": seats}}
+    try:
+        await db.package_inventory.update_one(query, update, upsert=True)
+        return True
+    except DuplicateKeyError:
+        # Either the date is full (the upsert tried to add a second counter) or
+        # another request created the counter first; retry without upserting.
+        result = await db.package_inventory.update_one(query, update)
+        return result.modified_count == 1
+
+async def release_inventory(package: dict, travel_date: datetime, seats: int = 1):
+    if package.get("daily_capacity") is None:
+        return
+    await db.package_inventory.update_one(
+        {**inventory_key(package["id"], travel_date), "booked": {"$gte": seats}},
+        {"$inc": {"booked": -seats}}
+    )
+
+@api_router.get("/availability")
+async def get_availability(
+    package_ids: List[str] = Query(...),
+    start: date = Query(...),
+    end: date = Query(...)
+):
+    """Remaining seats per day for several packages over a date range"""
+    if end < start or (end - start).days >= MAX_AVAILABILITY_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range must be 1-{MAX_AVAILABILITY_DAYS} days")
+    if len(package_ids) > MAX_AVAILABILITY_PACKAGES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_AVAILABILITY_PACKAGES} packages per request")
+    
+    packages = [package for package in await package_loader.load_many(package_ids) if package]
+    counters = await db.package_inventory.find({
+        "package_id": {"$in": [package["id"] for package in packages]},
+        "date": {"$gte": start.isoformat(), "$lte": end.isoformat()}
+    }).to_list(None)
+    booked = {(counter["package_id"], counter["date"]): counter["booked"] for counter in counters}
+    
+    days = [(start + timedelta(days=offset)).isoformat() for offset in range((end - start).days + 1)]
+    result = []
+    for package in packages:
+        capacity = package.get("daily_capacity")
+        result.append({
+            "package_id": package["id"],
+            "daily_capacity": capacity,
+            "days": [
+                {
+                    "date": day,
+                    "remaining": None if capacity is None else max(capacity - booked.get((package["id"], day), 0), 0)
+                }
+                for day in days
+            ]
+        })
+    return {"start": start, "end": end, "packages": result}
 
 # Booking Routes
 @api_router.post("/bookings")
 async def create_booking(
     package_id: str,
     travel_date: datetime,
-    current_user: dict = Depends(get_current_user)
+    response: Response,
+    current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255)
 ):
-    package = await db.packages.find_one({"id": package_id})
-    if not package:
-        raise HTTPException(status_code=404, detail="Package not found")
+    async def book():
+        package = await package_loader.load(package_id)
+        if not package:
+            raise HTTPException(status_code=404, detail="Package not found")
+        
+        if not await reserve_inventory(package, travel_date):
+            raise HTTPException(status_code=409, detail=f"Package is sold out on {travel_date.date()}")
+        
+        booking = Booking(
+            user_id=current_user["id"],
+            agent_id=package["agent_id"],
+            package_id=package_id,
+            status="pending",
+            booking_date=datetime.utcnow(),
+            travel_date=travel_date,
+            total_amount=package["price"],
+            package_summary=package_summary(package)
+        )
+        
+        try:
+            await db.bookings.insert_one(booking.dict())
+        except Exception:
+            await release_inventory(package, travel_date)
+            raise
+        booking_counters.record(package["agent_id"])
+        return {"message": "Booking created successfully", "booking_id": booking.id}
     
-    booking = Booking(
-        user_id=current_user["id"],
-        agent_id=package["agent_id"],
-        package_id=package_id,
-        status="pending",
-        booking_date=datetime.utcnow(),
-        travel_date=travel_date,
-        total_amount=package["price"]
+    if not idempotency_key:
+        return await book()
+    
+    # Retries with the same key replay the first outcome instead of booking again
+    result, replayed = await idempotency_store.run(
+        scope=f"bookings:{current_user['id']}",
+        key=idempotency_key,
+        fingerprint=request_fingerprint({"package_id": package_id, "travel_date": travel_date}),
+        operation=book
     )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+MAX_BULK_BOOKING_ITEMS = 20
+
+@api_router.post("/bookings/bulk")
+async def create_bulk_booking(
+    request: BulkBookingRequest,
+    response: Response,
+    current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255)
+):
+    """Book several packages (e.g. a budget-travel combination) all-or-nothing"""
+    items = request.booking_items()
+    if len(items) > MAX_BULK_BOOKING_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_BOOKING_ITEMS} packages can be booked at once")
     
-    await db.bookings.insert_one(booking.dict())
-    return {"message": "Booking created successfully", "booking_id": booking.id}
+    async def book_all():
+        # One batched read validates every package before anything is written
+        packages = await package_loader.load_many([item.package_id for item in items])
+        missing = [item.package_id for item, package in zip(items, packages) if not package or not package.get("is_active")]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Packages not found: {', '.join(missing)}")
+        
+        group_id = str(uuid.uuid4())
+        reserved = []
+        
+        async def undo():
+            # Remove whatever part of the batch made it in and give every seat back
+            await db.bookings.delete_many({"group_id": group_id})
+            for held_package, held_date in reserved:
+                await release_inventory(held_package, held_date, request.num_persons)
+        
+        try:
+            # Take seats for every item; a full date undoes the ones already taken
+            for item, package in zip(items, packages):
+                if not await reserve_inventory(package, item.travel_date, request.num_persons):
+                    raise HTTPException(
+                        status_code=409,
+                        detail=f"{package['title']} is sold out on {item.travel_date.date()}"
+                    )
+                reserved.append((package, item.travel_date))
+            
+            bookings = [
+                Booking(
+                    user_id=current_user["id"],
+                    agent_id=package["agent_id"],
+                    package_id=item.package_id,
+                    status="pending",
+                    booking_date=datetime.utcnow(),
+                    travel_date=item.travel_date,
+                    total_amount=package["price"] * request.num_persons,
+                    group_id=group_id,
+                    package_summary=package_summary(package)
+                )
+                for item, package in zip(items, packages)
+            ]
+            await db.bookings.insert_many([booking.dict() for booking in bookings], ordered=True)
+        except BaseException as e:
+            # Any failure, including timeouts, lost connections and cancellation,
+            # must not leave seats taken or half a group booked
+            await asyncio.shield(undo())
+            if isinstance(e, HTTPException) or not isinstance(e, Exception):
+                raise
+            logger.exception(f"Bulk booking {group_id} failed")
+            raise HTTPException(status_code=500, detail="Bulk booking failed; no bookings were created")
+        
+        for booking in bookings:
+            booking_counters.record(booking.agent_id)
+        
+        return {
+            "message": f"{len(bookings)} bookings created successfully",
+            "group_id": group_id,
+            "booking_ids": [booking.id for booking in bookings],
+            "total_amount": sum(booking.total_amount for booking in bookings)
+        }
+    
+    if not idempotency_key:
+        return await book_all()
+    
+    result, replayed = await idempotency_store.run(
+        scope=f"bookings-bulk:{current_user['id']}",
+        key=idempotency_key,
+        fingerprint=request_fingerprint(request.dict()),
+        operation=book_all
+    )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
 
 @api_router.get("/bookings", response_model=List[Booking])
-async def get_user_bookings(current_user: dict = Depends(get_current_user)):
-    bookings = await db.bookings.find({"user_id": current_user["id"]}).to_list(100)
+async def get_user_bookings(
+    response: Response,
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Newest bookings first; pass the X-Next-Cursor header back as cursor for the next page"""
+    query = {"user_id": current_user["id"]}
+    if cursor:
+        created_at, booking_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "id": {"$lt": booking_id}}
+        ]
+    
+    bookings = await db.bookings.find(query).sort([("created_at", -1), ("id", -1)]).limit(limit).to_list(limit)
+    
+    # Bookings made before summaries were denormalized get one batched lookup
+    missing = list({booking["package_id"] for booking in bookings if not booking.get("package_summary")})
+    if missing:
+        packages = {package["id"]: package for package in await package_loader.load_many(missing) if package}
+        for booking in bookings:
+            if not booking.get("package_summary") and booking["package_id"] in packages:
+                booking["package_summary"] = package_summary(packages[booking["package_id"]])
+    
+    if len(bookings) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(bookings[-1]["created_at"], bookings[-1]["id"])
     return [Booking(**booking) for booking in bookings]
 
+# Stats Routes
+@api_router.get("/stats/booking-counters")
+async def get_booking_counter_stats():
+    """How far agent booking counters lag behind recorded bookings"""
+    return booking_counters.stats()
+
+@api_router.get("/stats/queries", dependencies=[Depends(require_admin_token)])
+async def get_query_stats():
+    """Mongo command latency per collection and the most recent slow queries"""
+    return {
+        "slow_query_ms": query_monitor.slow_ms,
+        "commands": query_monitor.stats(),
+        "slow_queries": list(query_monitor.slow_queries)
+    }
+
+@api_router.get("/stats/chat")
+async def get_chat_stats():
+    """Chat fan-out metrics for this worker"""
+    return {
+        "broker": chat_broker.name,
+        "connections": chat_hub.connection_count(),
+        **chat_broker.stats.as_dict(),
+        "dropped": chat_broker.stats.dropped + chat_hub.dropped
+    }
+
 # Budget Travel Routes
 @api_router.post("/budget-travel", response_model=BudgetTravelResponse)
 async def find_budget_travel_packages(request: BudgetTravelRequest):
@@ -491,46 +1399,336 @@ async def find_budget_travel_packages(request: BudgetTravelRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error finding budget combinations: {str(e)}")
 
+# Budget travel preview, kept as one materialized summary document that
+# package writes update incrementally instead of rescanning the catalog.
+PREVIEW_STATS_ID = "budget_travel_preview"
+PRICE_HISTOGRAM_STEP = 500  # ₹ width of each budget slider bucket
+PREVIEW_PERCENTILES = [10, 25, 50, 75, 90]
+
+def stat_key(value) -> str:
+    """Make a value safe to use as a Mongo field name"""
+    return str(value).replace(".", "\uff0e").replace("$", "\uff04")
+
+def unstat_key(key: str) -> str:
+    return key.replace("\uff0e", ".").replace("\uff04", "$")
+
+def preview_contribution(package: dict) -> dict:
+    """Counter fields a single active package adds to the preview summary"""
+    return {
+        "total_packages": 1,
+        f"price_buckets.{int(package['price'] // PRICE_HISTOGRAM_STEP)}": 1,
+        f"duration_counts.{package.get('duration_days', 0)}": 1,
+        f"destination_counts.{stat_key(package['destination'])}": 1
+    }
+
+async def rebuild_budget_preview():
+    """Recompute the preview summary from scratch (used after bulk loads)"""
+    summary = {
+        "total_packages": 0,
+        "price_buckets": {},
+        "duration_counts": {},
+        "destination_counts": {}
+    }
+    cursor = db.packages.find(
+        {"is_active": True},
+        {"_id": 0, "price": 1, "duration_days": 1, "destination": 1}
+    )
+    async for package in cursor:
+        for field, count in preview_contribution(package).items():
+            if "." in field:
+                group, key = field.split(".", 1)
+                summary[group][key] = summary[group].get(key, 0) + count
+            else:
+                summary[field] += count
+        price = package["price"]
+        # Bounds stay unset on an empty catalog rather than null
+        summary["min_price"] = min(summary.get("min_price", price), price)
+        summary["max_price"] = max(summary.get("max_price", price), price)
+    
+    await db.catalog_stats.replace_one({"_id": PREVIEW_STATS_ID}, summary, upsert=True)
+
+async def refresh_preview_price_bounds():
+    """Re-read min/max price after the package holding one of them changed"""
+    cheapest = await db.packages.find({"is_active": True}, {"price": 1}).sort("price", 1).limit(1).to_list(1)
+    priciest = await db.packages.find({"is_active": True}, {"price": 1}).sort("price", -1).limit(1).to_list(1)
+    if cheapest:
+        update = {"$set": {"min_price": cheapest[0]["price"], "max_price": priciest[0]["price"]}}
+    else:
+        update = {"$unset": {"min_price": "", "max_price": ""}}
+    await db.catalog_stats.update_one({"_id": PREVIEW_STATS_ID}, update)
+
+async def update_budget_preview(previous: Optional[dict], current: Optional[dict]):
+    """Apply one package write (insert, update or deactivation) to the summary"""
+    bounds = await db.catalog_stats.find_one({"_id": PREVIEW_STATS_ID}, {"min_price": 1, "max_price": 1})
+    if not bounds:
+        await rebuild_budget_preview()
+        return
+    
+    deltas = {}
+    if previous and previous.get("is_active"):
+        for field, count in preview_contribution(previous).items():
+            deltas[field] = deltas.get(field, 0) - count
+    if current and current.get("is_active"):
+        for field, count in preview_contribution(current).items():
+            deltas[field] = deltas.get(field, 0) + count
+    
+    update = {}
+    deltas = {field: count for field, count in deltas.items() if count}
+    if deltas:
+        update["$inc"] = deltas
+    # Unset bounds (empty catalog) or nulls from older summaries are re-read
+    # instead: $min/$max never replace a stored null
+    unbounded = bounds.get("min_price") is None or bounds.get("max_price") is None
+    if current and current.get("is_active") and not unbounded:
+        update["$min"] = {"min_price": current["price"]}
+        update["$max"] = {"max_price": current["price"]}
+    if update:
+        stats = await db.catalog_stats.find_one_and_update(
+            {"_id": PREVIEW_STATS_ID}, update, return_document=ReturnDocument.AFTER
+        )
+        # $min/$max cannot shrink the range, so re-read it if a bound left
+        if unbounded or (previous and previous.get("is_active")
+                         and previous["price"] in (stats.get("min_price"), stats.get("max_price"))):
+            await refresh_preview_price_bounds()
+
+def bucket_percentiles(buckets: dict, total: int, min_price: float, max_price: float) -> dict:
+    """Approximate price percentiles from the bucket histogram"""
+    percentiles = {}
+    seen = 0
+    targets = list(PREVIEW_PERCENTILES)
+    for index in sorted(int(key) for key in buckets):
+        seen += buckets[str(index)]
+        while targets and seen >= total * targets[0] / 100:
+            upper = (index + 1) * PRICE_HISTOGRAM_STEP
+            percentiles[f"p{targets.pop(0)}"] = max(min(upper, max_price), min_price)
+    return percentiles
+
 @api_router.get("/budget-travel/preview")
 async def get_budget_travel_preview():
     """Get a preview of available destinations and price ranges for budget travel"""
     try:
-        # Get all active packages with basic stats
-        packages = await db.packages.find({"is_active": True}).to_list(100)
+        stats = await db.catalog_stats.find_one({"_id": PREVIEW_STATS_ID})
+        if not stats:
+            await rebuild_budget_preview()
+            stats = await db.catalog_stats.find_one({"_id": PREVIEW_STATS_ID})
         
-        destinations = set()
-        min_price = float('inf')
-        max_price = 0
-        duration_stats = {}
-        
-        for package in packages:
-            destinations.add(package['destination'])
-            min_price = min(min_price, package['price'])
-            max_price = max(max_price, package['price'])
-            
-            duration_days = parse_duration_to_days(package['duration'])
-            duration_stats[duration_days] = duration_stats.get(duration_days, 0) + 1
+        destinations = [unstat_key(key) for key, count in stats["destination_counts"].items() if count > 0]
+        duration_stats = {int(days): count for days, count in stats["duration_counts"].items() if count > 0}
+        price_buckets = {key: count for key, count in stats["price_buckets"].items() if count > 0}
+        min_price = stats.get("min_price") or 0
+        max_price = stats.get("max_price") or 0
+        total_packages = stats["total_packages"]
         
         return {
-            "available_destinations": list(destinations),
+            "available_destinations": destinations,
             "price_range": {
-                "min": min_price if min_price != float('inf') else 0,
+                "min": min_price,
                 "max": max_price
             },
+            "price_percentiles": bucket_percentiles(price_buckets, total_packages, min_price, max_price),
+            "price_histogram": [
+                {
+                    "min": int(key) * PRICE_HISTOGRAM_STEP,
+                    "max": (int(key) + 1) * PRICE_HISTOGRAM_STEP,
+                    "count": price_buckets[key]
+                }
+                for key in sorted(price_buckets, key=int)
+            ],
             "popular_durations": sorted(duration_stats.items(), key=lambda x: x[1], reverse=True)[:5],
-            "total_packages": len(packages),
-            "suggestion": f"Budget range: ₹{min_price}-₹{max_price} per person. Popular destinations: {', '.join(list(destinations)[:3])}"
+            "total_packages": total_packages,
+            "suggestion": f"Budget range: ₹{min_price}-₹{max_price} per person. Popular destinations: {', '.join(destinations[:3])}"
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting budget preview: {str(e)}")
 
 # Chat Routes
+# Live chat sessions on this worker. A user session listens to its own
+# conversation about a package; an agent's staff session listens to every
+# conversation about that package. Events reach the hubs of all workers
+# through the chat broker (in-process unless CHAT_BROKER_URL points at Redis).
+chat_hub = ChatHub()
+chat_broker = create_chat_broker(os.environ.get('CHAT_BROKER_URL'))
+
+def conversation_channel(package_id: str, user_id: str) -> str:
+    return f"conversation:{package_id}:{user_id}"
+
+def package_channel(package_id: str) -> str:
+    return f"package:{package_id}"
+
+# One summary document per (package, user) conversation holds the last message
+# and each side's unread count, so inboxes never count chat_messages.
+def conversation_id(package_id: str, user_id: str) -> str:
+    return f"{package_id}:{user_id}"
+
+def unread_field(reader: str) -> str:
+    return "unread_by_agent" if reader == "agent" else "unread_by_user"
+
+async def update_conversation_summary(chat_message: ChatMessage):
+    """Record a new message as the conversation's latest and count it unread for the recipient"""
+    recipient = "agent" if chat_message.sender_type == "user" else "user"
+    update = {
+        "$set": {
+            "package_id": chat_message.package_id,
+            "user_id": chat_message.user_id,
+            "agent_id": chat_message.agent_id,
+            "last_message": {
+                "id": chat_message.id,
+                "message": chat_message.message,
+                "sender_type": chat_message.sender_type,
+                "timestamp": chat_message.timestamp
+            },
+            "last_message_at": chat_message.timestamp
+        },
+        "$inc": {"message_count": 1, unread_field(recipient): 1}
+    }
+    key = {"_id": conversation_id(chat_message.package_id, chat_message.user_id)}
+    try:
+        await db.chat_conversations.update_one(key, update, upsert=True)
+    except DuplicateKeyError:
+        # Another message created the summary first
+        await db.chat_conversations.update_one(key, update)
+
+async def mark_conversation_read(package_id: str, user_id: str, reader: str) -> int:
+    """Clear the reader's unread count; returns how many messages it covered"""
+    field = unread_field(reader)
+    previous = await db.chat_conversations.find_one_and_update(
+        {"_id": conversation_id(package_id, user_id)},
+        {"$set": {field: 0, f"{reader}_read_at": datetime.utcnow()}},
+        projection={field: 1, "last_message_at": 1}
+    )
+    if previous is None:
+        return 0
+    if previous.get(field):
+        # Only messages the cleared count covered; later ones stay unread
+        await db.chat_messages.update_many(
+            {
+                "package_id": package_id,
+                "user_id": user_id,
+                "sender_type": "user" if reader == "agent" else "agent",
+                "is_read": False,
+                "timestamp": {"$lte": previous["last_message_at"]}
+            },
+            {"$set": {"is_read": True}}
+        )
+    return previous.get(field, 0)
+
+async def conversation_page(query: dict, reader: str, limit: int, cursor: Optional[str], response: Response) -> List[Conversation]:
+    """Most recently active conversations first, keyset-paged on (last_message_at, _id)"""
+    if cursor:
+        last_message_at, last_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"last_message_at": {"$lt": last_message_at}},
+            {"last_message_at": last_message_at, "_id": {"$lt": last_id}}
+        ]
+    
+    conversations = await db.chat_conversations.find(query).sort(
+        [("last_message_at", -1), ("_id", -1)]
+    ).limit(limit).to_list(limit)
+    
+    package_ids = list({conversation["package_id"] for conversation in conversations})
+    packages = {package["id"]: package for package in await package_loader.load_many(package_ids) if package}
+    
+    if len(conversations) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(conversations[-1]["last_message_at"], conversations[-1]["_id"])
+    return [
+        Conversation(
+            id=conversation["_id"],
+            package_id=conversation["package_id"],
+            user_id=conversation["user_id"],
+            agent_id=conversation["agent_id"],
+            last_message=conversation["last_message"],
+            last_message_at=conversation["last_message_at"],
+            message_count=conversation.get("message_count", 0),
+            unread_count=conversation.get(unread_field(reader), 0),
+            package_summary=package_summary(packages[conversation["package_id"]]) if conversation["package_id"] in packages else None
+        )
+        for conversation in conversations
+    ]
+
+async def deliver_chat_message(chat_message: ChatMessage):
+    """Store a chat message and push it to the live sessions following it"""
+    await db.chat_messages.insert_one(chat_message.dict())
+    await update_conversation_summary(chat_message)
+    await chat_broker.publish(
+        [conversation_channel(chat_message.package_id, chat_message.user_id), package_channel(chat_message.package_id)],
+        {"type": "message", "message": jsonable_encoder(chat_message)}
+    )
+
+async def authenticate_websocket(websocket: WebSocket) -> dict:
+    """User behind an accepted socket, from a Bearer header or a first {"type": "auth", "token": ...} frame"""
+    scheme, _, token = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer":
+        data = json.loads(await asyncio.wait_for(websocket.receive_text(), CHAT_AUTH_TIMEOUT_SECONDS))
+        token = data.get("token") if isinstance(data, dict) and data.get("type") == "auth" else None
+    return await user_from_token(token if isinstance(token, str) else "")
+
+@api_router.websocket("/chat/ws/{package_id}")
+async def chat_websocket(websocket: WebSocket, package_id: str):
+    """Real-time chat for a package.
+    
+    Browsers cannot set headers on a WebSocket and a token in the URL ends up
+    in access logs, so clients send their JWT as the first frame (see
+    authenticate_websocket). The server replies {"type": "ready"} once the
+    session is live, or closes with 1008.
+    """
+    await websocket.accept()
+    try:
+        user = await authenticate_websocket(websocket)
+    except WebSocketDisconnect:
+        return
+    except (asyncio.TimeoutError, ValueError, HTTPException):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    package = await package_loader.load(package_id)
+    if not package:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    is_agent = user.get("agent_id") == package["agent_id"]
+    channel = package_channel(package_id) if is_agent else conversation_channel(package_id, user["id"])
+    
+    connection = chat_hub.connect(websocket, [channel])
+    # Queued behind nothing, and ahead of any message published from here on
+    connection.push({"type": "ready"})
+    try:
+        while True:
+            try:
+                data = json.loads(await websocket.receive_text())
+            except ValueError:
+                continue
+            if not isinstance(data, dict):
+                continue
+            text = str(data.get("message", "")).strip()
+            if not text:
+                continue
+            if is_agent:
+                # Agents answer an existing conversation: {"user_id": ..., "message": ...}
+                conversation_user = data.get("user_id")
+                if not isinstance(conversation_user, str) or not await db.chat_conversations.find_one(
+                    {"_id": conversation_id(package_id, conversation_user)}, {"_id": 1}
+                ):
+                    continue
+            else:
+                conversation_user = user["id"]
+            await deliver_chat_message(ChatMessage(
+                user_id=conversation_user,
+                package_id=package_id,
+                agent_id=package["agent_id"],
+                message=text,
+                sender_type="agent" if is_agent else "user"
+            ))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        chat_hub.disconnect(connection)
+
 @api_router.post("/chat/send")
 async def send_chat_message(request: ChatRequest, current_user: dict = Depends(get_current_user)):
     """Send a message in package chat"""
     try:
         # Get package details to find agent_id
-        package = await db.packages.find_one({"id": request.package_id})
+        package = await package_loader.load(request.package_id)
         if not package:
             raise HTTPException(status_code=404, detail="Package not found")
         
@@ -543,8 +1741,8 @@ async def send_chat_message(request: ChatRequest, current_user: dict = Depends(g
             sender_type="user"
         )
         
-        # Save to database
-        await db.chat_messages.insert_one(chat_message.dict())
+        # Save to database and push to live sessions
+        await deliver_chat_message(chat_message)
         
         return {"message": "Message sent successfully", "chat_id": chat_message.id}
     
@@ -553,37 +1751,233 @@ async def send_chat_message(request: ChatRequest, current_user: dict = Depends(g
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error sending message: {str(e)}")
 
-@api_router.get("/chat/{package_id}")
-async def get_chat_messages(package_id: str, current_user: dict = Depends(get_current_user)):
-    """Get chat messages for a package"""
-    try:
-        messages = await db.chat_messages.find({
-            "package_id": package_id,
-            "user_id": current_user["id"]
-        }).sort("timestamp", 1).to_list(100)
-        
-        return [ChatMessage(**msg) for msg in messages]
+@api_router.get("/chat/inbox", response_model=List[Conversation])
+async def get_chat_inbox(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """The user's conversations with their last message and unread count, most recent first"""
+    return await conversation_page({"user_id": current_user["id"]}, "user", limit, cursor, response)
+
+@api_router.post("/chat/{package_id}/read")
+async def mark_chat_read(package_id: str, current_user: dict = Depends(get_current_user)):
+    """Mark the agent's messages in this conversation as read"""
+    marked = await mark_conversation_read(package_id, current_user["id"], "user")
+    return {"message": "Conversation marked as read", "marked": marked}
+
+async def chat_compaction_job():
+    while True:
+        try:
+            await chat_archive.compact()
+        except Exception:
+            logger.exception("Chat archive compaction failed")
+        await asyncio.sleep(CHAT_COMPACTION_SECONDS)
+
+async def chat_history(package_id: str, user_id: str, since: Optional[str], before: Optional[str],
+                       limit: int, response: Response) -> List[ChatMessage]:
+    """One page of a conversation, oldest first, with cursors in the response headers.
+    
+    Recent messages come from chat_messages; a page reaching past the hot
+    retention window is completed from chat_archive.
+    """
+    if since and before:
+        raise HTTPException(status_code=400, detail="Use either since or before, not both")
+    
+    query = {"package_id": package_id, "user_id": user_id}
+    cursor = since or before
+    position = None
+    if cursor:
+        position = decode_cursor(cursor)
+        timestamp, message_id = position
+        op = "$gt" if since else "$lt"
+        query["$or"] = [
+            {"timestamp": {op: timestamp}},
+            {"timestamp": timestamp, "id": {op: message_id}}
+        ]
     
+    try:
+        if since:
+            archived = []
+            if position[0] < chat_archive.cutoff():
+                # The client is far enough behind that some messages were archived
+                archived = await chat_archive.read(package_id, user_id, limit, after=position)
+            remaining = limit - len(archived)
+            messages = archived + (await db.chat_messages.find(query).sort(
+                [("timestamp", 1), ("id", 1)]
+            ).limit(remaining).to_list(remaining) if remaining else [])
+        else:
+            messages = await db.chat_messages.find(query).sort(
+                [("timestamp", -1), ("id", -1)]
+            ).limit(limit).to_list(limit)
+            messages.reverse()
+            if len(messages) < limit:
+                oldest = (messages[0]["timestamp"], messages[0]["id"]) if messages else position
+                messages = await chat_archive.read(package_id, user_id, limit - len(messages), before=oldest) + messages
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting messages: {str(e)}")
+    
+    if messages:
+        response.headers["X-Since-Cursor"] = encode_cursor(messages[-1]["timestamp"], messages[-1]["id"])
+        if not since and len(messages) == limit:
+            response.headers["X-Before-Cursor"] = encode_cursor(messages[0]["timestamp"], messages[0]["id"])
+    elif since:
+        response.headers["X-Since-Cursor"] = since
+    
+    return [ChatMessage(**msg) for msg in messages]
 
-async def populate_sample_data():
-    """Populate the database with comprehensive sample data"""
+@api_router.get("/chat/{package_id}")
+async def get_chat_messages(
+    package_id: str,
+    response: Response,
+    since: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get chat messages for a package, oldest first.
     
-    # Clear existing data
-    await db.agents.delete_many({})
-    await db.packages.delete_many({})
-    await db.ribbons.delete_many({})
-    await db.chat_messages.delete_many({})  # Clear chat messages too
+    Without a cursor this returns the latest `limit` messages. Pass the
+    X-Since-Cursor header back as `since` to fetch only newer messages, or
+    X-Before-Cursor as `before` to page back through older history.
+    """
+    return await chat_history(package_id, current_user["id"], since, before, limit, response)
+
+# Agent Chat Routes
+# Staff accounts (users with an agent_id) work through the conversations on
+# their agent's packages.
+async def agent_conversation(agent: dict, package_id: str, user_id: str) -> dict:
+    """The agent's conversation with a user about a package, or 404"""
+    conversation = await db.chat_conversations.find_one(
+        {"_id": conversation_id(package_id, user_id), "agent_id": agent["agent_id"]}
+    )
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return conversation
+
+@api_router.get("/agent/conversations", response_model=List[Conversation])
+async def get_agent_conversations(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    unread_only: bool = False,
+    current_agent: dict = Depends(get_current_agent)
+):
+    """The agent's conversations, most recently active first; page with X-Next-Cursor"""
+    query = {"agent_id": current_agent["agent_id"]}
+    if unread_only:
+        query["unread_by_agent"] = {"$gt": 0}
+    return await conversation_page(query, "agent", limit, cursor, response)
+
+@api_router.get("/agent/conversations/{package_id}/{user_id}")
+async def get_agent_conversation_messages(
+    package_id: str,
+    user_id: str,
+    response: Response,
+    since: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_agent: dict = Depends(get_current_agent)
+):
+    """Messages in one of the agent's conversations; same cursors as /chat/{package_id}"""
+    await agent_conversation(current_agent, package_id, user_id)
+    return await chat_history(package_id, user_id, since, before, limit, response)
+
+@api_router.post("/agent/conversations/{package_id}/{user_id}/reply")
+async def reply_to_conversation(
+    package_id: str,
+    user_id: str,
+    request: AgentReplyRequest,
+    current_agent: dict = Depends(get_current_agent)
+):
+    """Answer a user's conversation as the agent"""
+    await agent_conversation(current_agent, package_id, user_id)
+    chat_message = ChatMessage(
+        user_id=user_id,
+        package_id=package_id,
+        agent_id=current_agent["agent_id"],
+        message=request.message,
+        sender_type="agent"
+    )
+    await deliver_chat_message(chat_message)
+    return {"message": "Reply sent successfully", "chat_id": chat_message.id}
+
+@api_router.post("/agent/conversations/{package_id}/{user_id}/read")
+async def mark_agent_conversation_read(
+    package_id: str,
+    user_id: str,
+    current_agent: dict = Depends(get_current_agent)
+):
+    """Mark the user's messages in this conversation as read by the agent"""
+    await agent_conversation(current_agent, package_id, user_id)
+    marked = await mark_conversation_read(package_id, user_id, "agent")
+    return {"message": "Conversation marked as read", "marked": marked}
+
+def prepare_seed_agent(agent: dict) -> dict:
+    agent["rank_score"] = calculate_rank_score(agent)
+    return agent
+
+def prepare_seed_package(package: dict) -> dict:
+    package["geo_location"] = geo_point(package["latitude"], package["longitude"])
+    package["daily_capacity"] = SPONSORED_DAILY_CAPACITY if package["is_sponsored"] else None
+    return package
+
+def sample_ribbons(recommended_items: List[dict]) -> List[dict]:
+    """Filter, Recommended and Explore ribbons with proper filter options"""
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "title": "Filter Options",
+            "type": "filter",
+            "items": [
+                {"name": "Travel", "value": "travel", "icon": "🏔️"},
+                {"name": "Transport", "value": "transport", "icon": "🚗"},
+                {"name": "Sponsored", "value": "sponsored", "icon": "💰"},
+                {"name": "Goa", "value": "goa", "icon": "🏖️"},
+                {"name": "Himachal", "value": "himachal", "icon": "⛰️"},
+                {"name": "Uttarakhand", "value": "uttarakhand", "icon": "🏔️"}
+            ],
+            "order": 1,
+            "is_active": True
+        },
+        {
+            "id": str(uuid.uuid4()),
+            "title": "Recommended",
+            "type": "recommendation",
+            "items": recommended_items,  # Dynamic subscribed agents
+            "order": 2,
+            "is_active": True
+        },
+        {
+            "id": str(uuid.uuid4()),
+            "title": "Explore More",
+            "type": "explore",
+            "items": [
+                {"category": "Budget Travel", "title": "Find Best Deals", "action": "budget_travel"},
+                {"category": "Adventure", "title": "Trekking & Hiking", "action": "view_adventure"},
+                {"category": "Cultural", "title": "Heritage Tours", "action": "view_cultural"},
+                {"category": "Wellness", "title": "Spa & Yoga", "action": "view_wellness"}
+            ],
+            "order": 3,
+            "is_active": True
+        }
+    ]
+
+def build_sample_dataset() -> dict:
+    """The comprehensive sample agents, packages and ribbons"""
     
     # Generate comprehensive sample agents (100 total)
     agents, agent_ids = generate_comprehensive_sample_data()
-    
-    # Insert agents
-    await db.agents.insert_many(agents)
+    for agent in agents:
+        prepare_seed_agent(agent)
     
     # Get subscribed agents for recommended section
-    subscribed_agents = [agent for agent in agents if agent['is_subscribed']][:6]  # Top 6 subscribed agents
+    subscribed_agents = sorted(
+        [agent for agent in agents if agent['is_subscribed']],
+        key=lambda agent: agent['rank_score'],
+        reverse=True
+    )[:6]  # Top 6 subscribed agents
     
     # Update recommended ribbon with subscribed agents
     recommended_items = []
@@ -699,70 +2093,230 @@ async def populate_sample_data():
     # Add Goa packages
     packages.extend(goa_packages)
     
-    # Insert packages
-    await db.packages.insert_many(packages)
+    for package in packages:
+        prepare_seed_package(package)
     
-    # Create ribbons with proper filter options
-    ribbons = [
-        {
-            "id": str(uuid.uuid4()),
-            "title": "Filter Options",
-            "type": "filter",
-            "items": [
-                {"name": "Travel", "value": "travel", "icon": "🏔️"},
-                {"name": "Transport", "value": "transport", "icon": "🚗"},
-                {"name": "Sponsored", "value": "sponsored", "icon": "💰"},
-                {"name": "Goa", "value": "goa", "icon": "🏖️"},
-                {"name": "Himachal", "value": "himachal", "icon": "⛰️"},
-                {"name": "Uttarakhand", "value": "uttarakhand", "icon": "🏔️"}
-            ],
-            "order": 1,
-            "is_active": True
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "title": "Recommended",
-            "type": "recommendation",
-            "items": recommended_items,  # Dynamic subscribed agents
-            "order": 2,
-            "is_active": True
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "title": "Explore More",
-            "type": "explore",
-            "items": [
-                {"category": "Budget Travel", "title": "Find Best Deals", "action": "budget_travel"},
-                {"category": "Adventure", "title": "Trekking & Hiking", "action": "view_adventure"},
-                {"category": "Cultural", "title": "Heritage Tours", "action": "view_cultural"},
-                {"category": "Wellness", "title": "Spa & Yoga", "action": "view_wellness"}
-            ],
-            "order": 3,
-            "is_active": True
+    return {"agents": agents, "packages": packages, "ribbons": sample_ribbons(recommended_items)}
+
+# Collections replaced by a reseed; the chat and inventory ones start out empty
+# because they refer to the old packages
+SEED_EMPTIED_COLLECTIONS = ["chat_messages", "chat_conversations", "chat_archive", "package_inventory"]
+
+def seed_sources(generator: Optional[SyntheticDataGenerator] = None) -> dict:
+    """Collection name -> chunks of documents for a reseed"""
+    if generator:
+        sources = {
+            "agents": ([prepare_seed_agent(agent) for agent in chunk] for chunk in generator.agents(INIT_DATA_CHUNK_SIZE)),
+            "packages": ([prepare_seed_package(package) for package in chunk] for chunk in generator.packages(INIT_DATA_CHUNK_SIZE)),
+            "ribbons": [sample_ribbons([])]  # Recommendations are computed after the swap
         }
-    ]
+    else:
+        sources = {name: [documents] for name, documents in build_sample_dataset().items()}
+    for name in SEED_EMPTIED_COLLECTIONS:
+        sources[name] = []
+    return sources
+
+def snapshot_sources(path: Path, manifest: dict, collections: Optional[List[str]] = None) -> dict:
+    return {
+        name: snapshot_chunks(path, name, manifest["format"], INIT_DATA_CHUNK_SIZE)
+        for name in manifest["collections"]
+        if collections is None or name in collections
+    }
+
+async def finish_seed_load(fixture: Optional[dict] = None):
+    """Rebuild everything derived from the catalog once a reseed is live.
     
-    # Insert ribbons
-    await db.ribbons.insert_many(ribbons)
+    `fixture` records which snapshot is now loaded so restoring it again only
+    has to reload its mutable collections; any other reseed clears that record.
+    """
+    await create_indexes()
+    # Snapshots can hold packages written before duration_days was normalized
+    await backfill_duration_days()
+    await refresh_recommended_ribbon()
+    await rebuild_budget_preview()
+    await bump_catalog_version()
+    if fixture:
+        await db.catalog_meta.replace_one({"_id": "fixture"}, {**fixture, "restored_at": datetime.utcnow()}, upsert=True)
+    else:
+        await db.catalog_meta.delete_one({"_id": "fixture"})
+
+def fixture_snapshot_path(name: str) -> Path:
+    if not re.fullmatch(r"[\w.-]+", name) or name.startswith("."):
+        raise HTTPException(status_code=400, detail="Invalid snapshot name")
+    return FIXTURES_DIR / name
+
+async def seed_load_result(agent_count: Optional[int] = None) -> dict:
+    """Wait for the running /init-data load and report how it ended"""
+    status = await seed_loader.wait()
+    if status["state"] != "completed":
+        raise HTTPException(status_code=500, detail=f"Sample data initialization failed: {status['error']}")
+    if agent_count is None:
+        agent_count = await db.agents.count_documents({})
+    return {
+        "message": f"Sample data initialized successfully with {agent_count} agents and comprehensive packages",
+        "status": status
+    }
 
 # Initialize sample data
 @api_router.post("/init-data")
-async def initialize_sample_data():
-    """Initialize the database with comprehensive sample data"""
-    await populate_sample_data()
-    return {"message": "Sample data initialized successfully with 100 agents and comprehensive packages"}
+async def initialize_sample_data(
+    wait: bool = False,
+    seed: Optional[int] = None,
+    agents: Optional[int] = Query(None, ge=1, le=MAX_SEED_RECORDS),
+    packages: Optional[int] = Query(None, ge=1, le=MAX_SEED_RECORDS),
+    snapshot: Optional[str] = None,
+    force: bool = False,
+    x_admin_token: Optional[str] = Header(None, alias="X-Admin-Token")
+):
+    """Reseed agents, packages and ribbons in the background.
+    
+    Data is loaded into staging collections and swapped in when complete, so
+    the current catalog stays available meanwhile. Follow progress at
+    /init-data/status, or pass wait=true to return once the load is done
+    (joining one that is already running).
+    Passing seed, agents or packages loads a synthetic catalog of that size
+    instead of the comprehensive sample data. Passing snapshot restores that
+    fixture snapshot from FIXTURES_DIR; when it is already loaded only the
+    collections tests change are reset (force=true restores all of it). Those options need the X-Admin-Token header; without
+    it only the default sample data can be reloaded.
+    """
+    if (seed is not None or agents or packages or snapshot or force) and not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="seed, agents, packages and snapshot require X-Admin-Token")
+    
+    if seed_loader.running:
+        if wait:
+            # Join the load already running; its options win over these
+            return await seed_load_result()
+        return {"message": "Sample data initialization is already in progress", "status": seed_loader.status}
+    
+    if snapshot:
+        path = fixture_snapshot_path(snapshot)
+        try:
+            manifest = load_manifest(path)
+        except ValueError:
+            raise HTTPException(status_code=404, detail=f"Fixture snapshot {snapshot} not found")
+        agent_count = manifest["collections"].get("agents", {}).get("count", 0)
+        fixture = {"name": snapshot, "fingerprint": manifest["fingerprint"]}
+        loaded = await db.catalog_meta.find_one({"_id": "fixture"})
+        if not force and loaded and loaded["fingerprint"] == fixture["fingerprint"]:
+            # The catalog is unchanged, but earlier runs have booked, registered
+            # and chatted since; put those collections back as they were
+            sources = snapshot_sources(path, manifest, MUTABLE_COLLECTIONS)
+        else:
+            sources = snapshot_sources(path, manifest)
+        finish = partial(finish_seed_load, fixture)
+    else:
+        generator = None
+        if seed is not None or agents or packages:
+            generator = SyntheticDataGenerator(
+                seed=seed if seed is not None else 42,
+                agents=agents or 100,
+                packages=packages or 300,
+                now=datetime.utcnow()
+            )
+        agent_count = generator.counts["agents"] if generator else 100
+        sources = seed_sources(generator)
+        finish = finish_seed_load
+    
+    seed_loader.start(sources, finish=finish)
+    if not wait:
+        return {
+            "message": f"Sample data initialization started with {agent_count} agents and comprehensive packages",
+            "status": seed_loader.status
+        }
+    return await seed_load_result(agent_count)
+
+@api_router.get("/init-data/status")
+async def get_init_data_status():
+    """Progress of the latest /init-data load"""
+    return seed_loader.status
+
 
+# Metrics
+request_metrics = RequestMetrics()
+
+def application_metrics() -> List[str]:
+    """Write-behind booking counter and chat fan-out metrics"""
+    counters = booking_counters.stats()
+    chat = chat_broker.stats
+    lines = (
+        metric("booking_counter_pending_events", "gauge", "Bookings not yet flushed to agent totals", counters["pending_events"])
+        + metric("booking_counter_oldest_pending_seconds", "gauge", "Age of the oldest unflushed booking", counters["oldest_pending_age_seconds"])
+        + metric("booking_counter_flushed_events_total", "counter", "Bookings flushed to agent totals", counters["flushed_events"])
+        + metric("booking_counter_failed_flushes_total", "counter", "Failed booking counter flushes", counters["failed_flushes"])
+        + metric("chat_connections", "gauge", "Chat WebSocket sessions on this worker", chat_hub.connection_count())
+        + metric("chat_events_published_total", "counter", "Chat events published by this worker", chat.published)
+        + metric("chat_deliveries_total", "counter", "Chat events queued to local sessions", chat.delivered)
+        + metric("chat_events_dropped_total", "counter", "Chat events lost by the broker or full session queues", chat.dropped + chat_hub.dropped)
+        + metric_header("chat_fanout_latency_seconds", "histogram", "Time from publish to local delivery")
+    )
+    lines += histogram_samples(
+        "chat_fanout_latency_seconds", {"broker": chat_broker.name},
+        [bound / 1000 for bound in LATENCY_BUCKETS_MS], chat.latency_counts, chat.latency_sum_ms / 1000
+    )
+    
+    commands = query_monitor.stats()
+    for name, help_text, value in [
+        ("mongo_commands_total", "Mongo commands by collection", lambda row: row["count"]),
+        ("mongo_command_errors_total", "Failed Mongo commands by collection", lambda row: row["errors"]),
+        ("mongo_slow_commands_total", "Mongo commands slower than MONGO_SLOW_QUERY_MS", lambda row: row["slow"]),
+        ("mongo_command_seconds_total", "Time spent in Mongo commands by collection", lambda row: round(row["total_ms"] / 1000, 6)),
+        ("mongo_documents_returned_total", "Documents returned by Mongo cursors by collection", lambda row: row["documents_returned"])
+    ]:
+        lines += metric_header(name, "counter", help_text)
+        lines += [sample(name, {"collection": row["collection"], "command": row["command"]}, value(row)) for row in commands]
+    return lines
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics for this worker"""
+    lines = request_metrics.render() + application_metrics()
+    return Response("\n".join(lines) + "\n", media_type=CONTENT_TYPE)
+
+# Request profiling: requests sent with `X-Profile: <ADMIN_TOKEN>` (and a
+# PROFILE_SAMPLE_RATE fraction of all requests) are sampled every
+# PROFILE_INTERVAL_MS and written to PROFILE_DIR as flamegraph folded stacks,
+# keeping the newest PROFILE_MAX_FILES
+request_profiler = SamplingProfiler(
+    Path(os.environ.get('PROFILE_DIR', '/tmp/sponsoredtrip-profiles')),
+    interval=float(os.environ.get('PROFILE_INTERVAL_MS', '5')) / 1000,
+    max_profiles=int(os.environ.get('PROFILE_MAX_FILES', '200'))
+)
+
+@api_router.get("/admin/profiles", dependencies=[Depends(require_admin_token)])
+async def list_profiles(limit: int = Query(50, ge=1, le=500)):
+    """Most recent request profiles"""
+    return await request_profiler.recent(limit)
+
+@api_router.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin_token)])
+async def get_profile(profile_id: str):
+    """One request profile as folded stacks (flamegraph.pl / speedscope input)"""
+    folded = await request_profiler.read(profile_id) if re.fullmatch(r"[\w-]+", profile_id) else None
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(folded, media_type="text/plain")
 
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(
+    ProfilerMiddleware,
+    profiler=request_profiler,
+    authorize=is_admin,
+    sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    # Response headers the web build must be able to read (pagination, replays)
+    expose_headers=["X-Next-Cursor", "X-Since-Cursor", "X-Before-Cursor", "Idempotent-Replayed", "X-Profile-Id"],
 )
+# Added last so it wraps CORS too and times the whole request
+app.add_middleware(MetricsMiddleware, metrics=request_metrics)
 
 # Configure logging
 logging.basicConfig(
@@ -771,6 +2325,32 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+background_tasks: List[asyncio.Task] = []
+
+@app.on_event("startup")
+async def startup_db_client():
+    query_monitor.start(client)
+    await create_indexes()
+    await backfill_package_geo_locations()
+    await backfill_agent_rank_scores()
+    await chat_broker.start(chat_hub.publish)
+    background_tasks.append(asyncio.create_task(run_startup_backfills()))
+    background_tasks.append(asyncio.create_task(ribbon_refresh_job()))
+    booking_counters.start()
+    background_tasks.append(asyncio.create_task(chat_compaction_job()))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await seed_loader.stop()
+    await chat_broker.stop()
+    query_monitor.stop()
+    # Write out buffered booking counts before the connection goes away; the
+    # flush loop is stopped rather than cancelled so no batch is dropped mid-write
+    try:
+        await booking_counters.stop()
+    except Exception:
+        logger.exception("Final booking counter flush failed")
     client.close()
\ No newline at end of file
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindCounter:
+    """Buffer per-key increments in memory and flush them as one bulk write.
+
+    record() only touches a dict, so hot documents (e.g. a popular agent) get one
+    aggregated update per flush instead of one write per event. Call stop() on
+    shutdown so buffered events are not lost: it lets an in-flight flush finish
+    rather than cancelling it. A failed flush puts the events that were not
+    written back into the buffer for the next attempt.
+    """
+
+    def __init__(self, collection, key_field: str, make_update: Callable[[int], list],
+                 flush_interval: float = 5.0):
+        self.collection = collection
+        self.key_field = key_field
+        self.make_update = make_update
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, int] = {}
+        self._oldest_pending: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._stopping = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.flushed_events = 0
+        self.failed_flushes = 0
+        self.last_flush_at: Optional[float] = None
+        self.last_flush_seconds: Optional[float] = None
+
+    def record(self, key: str, count: int = 1):
+        self._pending[key] = self._pending.get(key, 0) + count
+        if self._oldest_pending is None:
+            self._oldest_pending = time.time()
+
+    async def flush(self) -> int:
+        """Write all buffered increments; returns the number of events flushed"""
+        async with self._lock:
+            if not self._pending:
+                return 0
+            batch, oldest = self._pending, self._oldest_pending
+            self._pending, self._oldest_pending = {}, None
+
+            items = list(batch.items())
+            started = time.monotonic()
+            try:
+                await self.collection.bulk_write([
+                    UpdateOne({self.key_field: key}, self.make_update(count))
+                    for key, count in items
+                ], ordered=False)
+            except BulkWriteError as e:
+                # Unordered: everything but the reported failures was applied
+                failed = [items[error["index"]] for error in e.details.get("writeErrors", [])]
+                self.flushed_events += sum(batch.values()) - sum(count for _, count in failed)
+                self._requeue(failed, oldest)
+                raise
+            except BaseException:
+                # Includes cancellation; whether the write landed is unknown
+                self._requeue(items, oldest)
+                raise
+
+            events = sum(batch.values())
+            self.flushed_events += events
+            self.last_flush_at = time.time()
+            self.last_flush_seconds = time.monotonic() - started
+            return events
+
+    def _requeue(self, items, oldest: Optional[float]):
+        self.failed_flushes += 1
+        for key, count in items:
+            self._pending[key] = self._pending.get(key, 0) + count
+        if items:
+            self._oldest_pending = min(filter(None, [oldest, self._oldest_pending]))
+
+    def start(self) -> asyncio.Task:
+        """Flush every flush_interval seconds in the background until stop()"""
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def stop(self) -> int:
+        """Stop the flush loop and write out everything still buffered"""
+        self._stopping.set()
+        if self._task:
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        return await self.flush()
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Write-behind flush failed; will retry")
+
+    def stats(self) -> dict:
+        """How far the stored counters lag behind recorded events"""
+        return {
+            "pending_events": sum(self._pending.values()),
+            "pending_keys": len(self._pending),
+            "oldest_pending_age_seconds": round(time.time() - self._oldest_pending, 3) if self._oldest_pending else 0,
+            "flushed_events": self.flushed_events,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_at": self.last_flush_at,
+            "last_flush_seconds": self.last_flush_seconds,
+            "flush_interval_seconds": self.flush_interval
+        }
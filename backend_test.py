@@ -6,6 +6,7 @@ Tests all backend endpoints systematically
 
 import requests
 import json
+import os
 import sys
 from datetime import datetime, timedelta
 import uuid
@@ -13,6 +14,11 @@ import uuid
 # Configuration
 BASE_URL = "https://tripaggregator.preview.emergentagent.com/api"
 HEADERS = {"Content-Type": "application/json"}
+# The server's ADMIN_TOKEN; needed to restore TEST_FIXTURE and for the staff-account tests
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+# Name of a fixture snapshot to restore instead of regenerating sample data
+INIT_PARAMS = {"wait": "true", "snapshot": os.environ["TEST_FIXTURE"]} if os.environ.get("TEST_FIXTURE") else {"wait": "true"}
+INIT_HEADERS = {"X-Admin-Token": ADMIN_TOKEN} if ADMIN_TOKEN else {}
 
 class BackendTester:
     def __init__(self):
@@ -52,7 +58,7 @@ class BackendTester:
         print("🔄 Testing Comprehensive Sample Data Initialization (100 Agents)...")
         
         try:
-            response = requests.post(f"{self.base_url}/init-data", headers=self.headers, timeout=30)
+            response = requests.post(f"{self.base_url}/init-data", params=INIT_PARAMS, headers={**self.headers, **INIT_HEADERS}, timeout=30)
             
             if response.status_code == 200:
                 data = response.json()
@@ -428,6 +434,69 @@ class BackendTester:
             self.log_result("Get User Bookings", False, f"Request failed: {str(e)}")
             return False
 
+    def test_booking_pagination(self):
+        """Test paging through booking history with X-Next-Cursor"""
+        print("🔄 Testing Booking Pagination...")
+
+        try:
+            _, headers = self.register_user("pager")
+            packages = requests.get(f"{self.base_url}/packages", headers=self.headers, timeout=10).json()[:3]
+            travel_date = (datetime.now() + timedelta(days=365 + uuid.uuid4().int % 3000)).isoformat()
+
+            # Three single bookings plus a bulk pair, usually stored in the same millisecond
+            booking_ids = []
+            for package in packages:
+                response = requests.post(
+                    f"{self.base_url}/bookings", headers=headers,
+                    params={"package_id": package["id"], "travel_date": travel_date}, timeout=10
+                )
+                response.raise_for_status()
+                booking_ids.append(response.json()["booking_id"])
+            response = requests.post(
+                f"{self.base_url}/bookings/bulk", headers=headers,
+                json={"items": [{"package_id": package["id"], "travel_date": travel_date} for package in packages[:2]]},
+                timeout=10
+            )
+            response.raise_for_status()
+            booking_ids.extend(response.json()["booking_ids"])
+
+            def walk(limit):
+                pages, cursor = [], None
+                while True:
+                    params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+                    response = requests.get(f"{self.base_url}/bookings", headers=headers, params=params, timeout=10)
+                    response.raise_for_status()
+                    pages.append(response.json())
+                    cursor = response.headers.get("X-Next-Cursor")
+                    if not cursor:
+                        return pages
+
+            everything = requests.get(f"{self.base_url}/bookings", headers=headers, timeout=10).json()
+            if sorted(booking["id"] for booking in everything) != sorted(booking_ids):
+                self.log_result("Booking Pagination", False, f"Default page returned {len(everything)} of {len(booking_ids)} bookings")
+                return False
+
+            # 2 leaves a short last page; 5 ends on a full page followed by an empty one
+            for limit, page_sizes in [(2, [2, 2, 1]), (5, [5, 0])]:
+                pages = walk(limit)
+                ids = [booking["id"] for page in pages for booking in page]
+                if [len(page) for page in pages] != page_sizes or ids != [booking["id"] for booking in everything]:
+                    self.log_result("Booking Pagination", False,
+                                  f"limit={limit}: pages of {[len(page) for page in pages]}, ids {ids} vs {[b['id'] for b in everything]}")
+                    return False
+
+            missing = [booking["id"] for booking in everything if not (booking.get("package_summary") or {}).get("title")]
+            if missing:
+                self.log_result("Booking Pagination", False, f"Bookings without package_summary: {missing}")
+                return False
+
+            self.log_result("Booking Pagination", True, f"{len(booking_ids)} bookings paged at limits 2 and 5 with no gaps or repeats")
+            return True
+
+        except Exception as e:
+            self.log_result("Booking Pagination", False, f"Request failed: {str(e)}")
+            return False
+
     def test_budget_travel_preview(self):
         """Test budget travel preview endpoint"""
         print("🔄 Testing Budget Travel Preview API...")
@@ -1446,6 +1515,467 @@ class BackendTester:
             self.log_result("Budget Travel Destination Groups", False, f"Request failed: {str(e)}")
             return False
 
+    def test_search_api(self):
+        """Test full-text search over packages and agents"""
+        print("🔄 Testing Search API...")
+        
+        try:
+            response = requests.get(
+                f"{self.base_url}/search",
+                params={"q": "goa beach", "page_size": 5},
+                headers=self.headers,
+                timeout=10
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
+                results = data.get("results", [])
+                scores = [result["score"] for result in results]
+                if not results:
+                    self.log_result("Search API", False, "No results for 'goa beach'", data)
+                    return False
+                if scores != sorted(scores, reverse=True):
+                    self.log_result("Search API", False, f"Results not ranked by score: {scores}")
+                    return False
+                if results[0]["kind"] != "package" or "Goa" not in results[0]["item"]["destination"]:
+                    self.log_result("Search API", False, f"Expected a Goa package first, got: {results[0]}")
+                    return False
+                
+                # Second page must not repeat the first page
+                page2 = requests.get(
+                    f"{self.base_url}/search",
+                    params={"q": "goa beach", "page_size": 5, "page": 2},
+                    headers=self.headers,
+                    timeout=10
+                ).json()
+                first_ids = {result["item"]["id"] for result in results}
+                if any(result["item"]["id"] in first_ids for result in page2.get("results", [])):
+                    self.log_result("Search API", False, "Page 2 repeats results from page 1")
+                    return False
+                
+                self.log_result("Search API", True, 
+                              f"Found {data['total']} matches, top result: {results[0]['item']['title']}")
+                return True
+            else:
+                self.log_result("Search API", False, 
+                              f"HTTP {response.status_code}: {response.text}")
+                return False
+                
+        except Exception as e:
+            self.log_result("Search API", False, f"Request failed: {str(e)}")
+            return False
+
+    def test_nearby_packages(self):
+        """Test geospatial nearby packages endpoint"""
+        print("🔄 Testing Nearby Packages...")
+        
+        try:
+            response = requests.get(
+                f"{self.base_url}/packages/nearby",
+                params={"lat": 15.2993, "lon": 74.1240, "radius_km": 50},
+                headers=self.headers,
+                timeout=10
+            )
+            
+            if response.status_code == 200:
+                packages = response.json()
+                distances = [pkg["distance_km"] for pkg in packages]
+                if not packages:
+                    self.log_result("Nearby Packages", False, "No packages found near Goa")
+                    return False
+                if distances != sorted(distances) or distances[-1] > 50:
+                    self.log_result("Nearby Packages", False, f"Distances not sorted or outside radius: {distances}")
+                    return False
+                if not all(pkg["destination"] == "Goa" for pkg in packages):
+                    self.log_result("Nearby Packages", False, 
+                                  f"Unexpected destinations: {[pkg['destination'] for pkg in packages]}")
+                    return False
+                
+                self.log_result("Nearby Packages", True, f"Found {len(packages)} packages within 50 km of Goa")
+                return True
+            else:
+                self.log_result("Nearby Packages", False, 
+                              f"HTTP {response.status_code}: {response.text}")
+                return False
+                
+        except Exception as e:
+            self.log_result("Nearby Packages", False, f"Request failed: {str(e)}")
+            return False
+
+    def test_booking_idempotency(self):
+        """Test that retried bookings with the same Idempotency-Key are not duplicated"""
+        print("🔄 Testing Booking Idempotency...")
+        
+        if not self.auth_token:
+            self.log_result("Booking Idempotency", False, "No auth token available")
+            return False
+        
+        try:
+            packages = requests.get(f"{self.base_url}/packages", headers=self.headers, timeout=10).json()
+            params = {
+                "package_id": packages[0]["id"],
+                "travel_date": (datetime.now() + timedelta(days=30)).isoformat()
+            }
+            headers = {**self.headers, "Idempotency-Key": str(uuid.uuid4())}
+            
+            first = requests.post(f"{self.base_url}/bookings", headers=headers, params=params, timeout=10)
+            retry = requests.post(f"{self.base_url}/bookings", headers=headers, params=params, timeout=10)
+            
+            if first.status_code != 200 or retry.status_code != 200:
+                self.log_result("Booking Idempotency", False, 
+                              f"HTTP {first.status_code}/{retry.status_code}: {retry.text}")
+                return False
+            if first.json()["booking_id"] != retry.json()["booking_id"]:
+                self.log_result("Booking Idempotency", False, "Retry created a second booking")
+                return False
+            
+            # Reusing the key for a different booking must be rejected
+            other_params = {**params, "travel_date": (datetime.now() + timedelta(days=31)).isoformat()}
+            mismatch = requests.post(f"{self.base_url}/bookings", headers=headers, params=other_params, timeout=10)
+            if mismatch.status_code != 422:
+                self.log_result("Booking Idempotency", False, 
+                              f"Expected 422 for reused key, got HTTP {mismatch.status_code}")
+                return False
+            
+            self.log_result("Booking Idempotency", True, "Retry replayed the original booking_id")
+            return True
+                
+        except Exception as e:
+            self.log_result("Booking Idempotency", False, f"Request failed: {str(e)}")
+            return False
+
+    def test_bulk_booking(self):
+        """Test booking several packages in one all-or-nothing request"""
+        print("🔄 Testing Bulk Booking...")
+        
+        if not self.auth_token:
+            self.log_result("Bulk Booking", False, "No auth token available")
+            return False
+        
+        try:
+            packages = requests.get(f"{self.base_url}/packages", headers=self.headers, timeout=10).json()
+            travel_date = (datetime.now() + timedelta(days=30)).isoformat()
+            items = [{"package_id": pkg["id"], "travel_date": travel_date} for pkg in packages[:2]]
+            
+            response = requests.post(
+                f"{self.base_url}/bookings/bulk",
+                headers=self.headers,
+                json={"items": items, "num_persons": 2},
+                timeout=10
+            )
+            if response.status_code != 200:
+                self.log_result("Bulk Booking", False, f"HTTP {response.status_code}: {response.text}")
+                return False
+            data = response.json()
+            if len(data.get("booking_ids", [])) != 2:
+                self.log_result("Bulk Booking", False, f"Expected 2 bookings, got: {data}")
+                return False
+            
+            # One unknown package must reject the whole request
+            bad_items = items + [{"package_id": str(uuid.uuid4()), "travel_date": travel_date}]
+            bad = requests.post(f"{self.base_url}/bookings/bulk", headers=self.headers, json={"items": bad_items}, timeout=10)
+            if bad.status_code != 404:
+                self.log_result("Bulk Booking", False, f"Expected 404 for unknown package, got HTTP {bad.status_code}")
+                return False
+            
+            self.log_result("Bulk Booking", True, f"Booked 2 packages for ₹{data['total_amount']} in group {data['group_id']}")
+            return True
+                
+        except Exception as e:
+            self.log_result("Bulk Booking", False, f"Request failed: {str(e)}")
+            return False
+
+    def test_package_inventory(self):
+        """Test per-date seat limits, availability counts and seat release on failed bulk bookings"""
+        print("🔄 Testing Package Inventory...")
+        
+        if not self.auth_token:
+            self.log_result("Package Inventory", False, "No auth token available")
+            return False
+        
+        try:
+            packages = requests.get(f"{self.base_url}/packages", headers=self.headers, timeout=10).json()
+            limited = [pkg for pkg in packages if pkg.get("daily_capacity")]
+            if not limited:
+                self.log_result("Package Inventory", False, "No package has a daily_capacity")
+                return False
+            package = limited[0]
+            capacity = package["daily_capacity"]
+            
+            # Random far-off dates so earlier runs' bookings do not interfere
+            offset = 365 + uuid.uuid4().int % 3000
+            full_date = datetime.now() + timedelta(days=offset)
+            spare_date = full_date + timedelta(days=1)
+            
+            def remaining(travel_date):
+                day = travel_date.date().isoformat()
+                response = requests.get(
+                    f"{self.base_url}/availability",
+                    params={"package_ids": package["id"], "start": day, "end": day},
+                    timeout=10
+                )
+                return response.json()["packages"][0]["days"][0]["remaining"]
+            
+            before = remaining(full_date)
+            booked = requests.post(
+                f"{self.base_url}/bookings", headers=self.headers,
+                params={"package_id": package["id"], "travel_date": full_date.isoformat()}, timeout=10
+            )
+            if booked.status_code != 200 or remaining(full_date) != before - 1:
+                self.log_result("Package Inventory", False, 
+                              f"Booking did not take a seat: HTTP {booked.status_code}, remaining {before} -> {remaining(full_date)}")
+                return False
+            
+            # Take the rest of the day's seats, then one more booking must be refused
+            rest = requests.post(
+                f"{self.base_url}/bookings/bulk", headers=self.headers,
+                json={"items": [{"package_id": package["id"], "travel_date": full_date.isoformat()}], "num_persons": before - 1},
+                timeout=10
+            )
+            sold_out = requests.post(
+                f"{self.base_url}/bookings", headers=self.headers,
+                params={"package_id": package["id"], "travel_date": full_date.isoformat()}, timeout=10
+            )
+            if rest.status_code != 200 or sold_out.status_code != 409:
+                self.log_result("Package Inventory", False, 
+                              f"Expected 200 then 409 at capacity, got HTTP {rest.status_code}/{sold_out.status_code}")
+                return False
+            
+            # A bulk booking that hits the full date must give back the seats it took on the other one
+            spare_before = remaining(spare_date)
+            failed = requests.post(
+                f"{self.base_url}/bookings/bulk", headers=self.headers,
+                json={"items": [
+                    {"package_id": package["id"], "travel_date": spare_date.isoformat()},
+                    {"package_id": package["id"], "travel_date": full_date.isoformat()}
+                ]},
+                timeout=10
+            )
+            if failed.status_code != 409 or remaining(spare_date) != spare_before:
+                self.log_result("Package Inventory", False, 
+                              f"Failed bulk booking kept seats: HTTP {failed.status_code}, remaining {spare_before} -> {remaining(spare_date)}")
+                return False
+            
+            self.log_result("Package Inventory", True, f"{package['title']} sold out at {capacity} seats; failed bulk booking released its seats")
+            return True
+                
+        except Exception as e:
+            self.log_result("Package Inventory", False, f"Request failed: {str(e)}")
+            return False
+
+    def register_user(self, prefix):
+        """Register a throwaway user and return (username, auth headers)"""
+        username = f"{prefix}_{str(uuid.uuid4())[:8]}"
+        response = requests.post(f"{self.base_url}/auth/register", json={
+            "username": username,
+            "email": f"{username}@example.com",
+            "password": "SecurePass123!",
+            "full_name": prefix.title()
+        }, timeout=10)
+        response.raise_for_status()
+        return username, {**HEADERS, "Authorization": f"Bearer {response.json()['access_token']}"}
+
+    def staff_account(self, agent_id):
+        """Register a user and link it to `agent_id` as staff (needs ADMIN_TOKEN); returns auth headers"""
+        staff_name, staff = self.register_user("staff")
+        response = requests.put(
+            f"{self.base_url}/admin/staff/{staff_name}",
+            headers={**HEADERS, "X-Admin-Token": ADMIN_TOKEN},
+            json={"agent_id": agent_id},
+            timeout=10
+        )
+        response.raise_for_status()
+        return staff
+
+    def test_facets(self):
+        """Test facet counts and that they follow package writes"""
+        print("🔄 Testing Facets...")
+        
+        if not ADMIN_TOKEN:
+            print("   Skipped: set ADMIN_TOKEN to provision a staff account\n")
+            return True
+        
+        try:
+            agent_id = requests.get(f"{self.base_url}/packages", headers=self.headers, timeout=10).json()[0]["agent_id"]
+            staff = self.staff_account(agent_id)
+            destination = f"Facet Test {str(uuid.uuid4())[:8]}"
+            package = {
+                "agent_id": agent_id,
+                "title": "Facet Test Package",
+                "description": "Created by the facet test",
+                "price": 7000,
+                "duration": "4 days 3 nights",
+                "destination": destination
+            }
+            
+            def facets():
+                data = requests.get(f"{self.base_url}/facets", timeout=10).json()
+                destinations = {f["value"]: f["count"] for f in data["destination"]}
+                price = {bucket["min"]: bucket["count"] for bucket in data["price"]}
+                return data["catalog_version"], destinations, price
+            
+            version, _, price = facets()
+            created = requests.post(f"{self.base_url}/packages", headers=staff, json=package, timeout=10)
+            if created.status_code != 200:
+                self.log_result("Facets", False, f"Could not create package: HTTP {created.status_code}: {created.text}")
+                return False
+            new_version, destinations, new_price = facets()
+            if new_version <= version or destinations.get(destination) != 1 or new_price[5000] != price[5000] + 1:
+                self.log_result("Facets", False, 
+                              f"Facets did not count the new package: version {version} -> {new_version}, "
+                              f"{destination}: {destinations.get(destination)}, ₹5000+ {price[5000]} -> {new_price[5000]}")
+                return False
+            
+            # Deactivating the package takes it out of the counts again
+            package_id = created.json()["id"]
+            requests.put(f"{self.base_url}/packages/{package_id}", headers=staff,
+                         json={**package, "is_active": False}, timeout=10)
+            _, destinations, final_price = facets()
+            if destination in destinations or final_price[5000] != price[5000]:
+                self.log_result("Facets", False, f"Deactivated package still counted: {destinations.get(destination)}")
+                return False
+            
+            self.log_result("Facets", True, f"Facet counts followed the package through catalog version {new_version}")
+            return True
+                
+        except Exception as e:
+            self.log_result("Facets", False, f"Request failed: {str(e)}")
+            return False
+
+    def test_chat_cursors(self):
+        """Test paging chat history with X-Before-Cursor and polling with X-Since-Cursor"""
+        print("🔄 Testing Chat Cursors...")
+        
+        try:
+            package = requests.get(f"{self.base_url}/packages", headers=self.headers, timeout=10).json()[0]
+            _, user = self.register_user("cursor")
+            url = f"{self.base_url}/chat/{package['id']}"
+            for text in ("first", "second", "third"):
+                requests.post(f"{self.base_url}/chat/send", headers=user,
+                              json={"package_id": package["id"], "message": text}, timeout=10)
+            
+            latest = requests.get(url, headers=user, params={"limit": 2}, timeout=10)
+            older = requests.get(url, headers=user, params={"before": latest.headers.get("X-Before-Cursor"), "limit": 2}, timeout=10)
+            pages = [[m["message"] for m in latest.json()], [m["message"] for m in older.json()]]
+            if pages != [["second", "third"], ["first"]]:
+                self.log_result("Chat Cursors", False, f"Unexpected pages: {pages}")
+                return False
+            
+            # Polling with the since cursor returns only what was sent after it
+            since = latest.headers.get("X-Since-Cursor")
+            empty = requests.get(url, headers=user, params={"since": since}, timeout=10)
+            requests.post(f"{self.base_url}/chat/send", headers=user,
+                          json={"package_id": package["id"], "message": "fourth"}, timeout=10)
+            newer = requests.get(url, headers=user, params={"since": since}, timeout=10)
+            if empty.json() != [] or [m["message"] for m in newer.json()] != ["fourth"]:
+                self.log_result("Chat Cursors", False, f"Unexpected since results: {empty.json()}, {newer.json()}")
+                return False
+            
+            self.log_result("Chat Cursors", True, "Paged back with before and polled new messages with since")
+            return True
+                
+        except Exception as e:
+            self.log_result("Chat Cursors", False, f"Request failed: {str(e)}")
+            return False
+
+    def test_chat_inbox(self):
+        """Test the user's conversation inbox, its paging and marking a conversation read"""
+        print("🔄 Testing Chat Inbox...")
+        
+        try:
+            packages = requests.get(f"{self.base_url}/packages", headers=self.headers, timeout=10).json()[:2]
+            _, user = self.register_user("inbox")
+            for package in packages:
+                requests.post(f"{self.base_url}/chat/send", headers=user,
+                              json={"package_id": package["id"], "message": f"About {package['title']}"}, timeout=10)
+            
+            # Most recently active first, one conversation per page
+            first = requests.get(f"{self.base_url}/chat/inbox", headers=user, params={"limit": 1}, timeout=10)
+            second = requests.get(f"{self.base_url}/chat/inbox", headers=user,
+                                  params={"limit": 1, "cursor": first.headers.get("X-Next-Cursor")}, timeout=10)
+            order = [c["package_id"] for c in first.json() + second.json()]
+            if order != [packages[1]["id"], packages[0]["id"]]:
+                self.log_result("Chat Inbox", False, f"Unexpected inbox order: {order}")
+                return False
+            if first.json()[0]["last_message"]["message"] != f"About {packages[1]['title']}":
+                self.log_result("Chat Inbox", False, f"Wrong last message: {first.json()[0]}")
+                return False
+            
+            if ADMIN_TOKEN:
+                # An agent reply shows up as unread until the user marks the conversation read
+                staff = self.staff_account(packages[0]["agent_id"])
+                user_id = requests.get(f"{self.base_url}/auth/me", headers=user, timeout=10).json()["id"]
+                requests.post(f"{self.base_url}/agent/conversations/{packages[0]['id']}/{user_id}/reply",
+                              headers=staff, json={"message": "Happy to help"}, timeout=10)
+                unread = requests.get(f"{self.base_url}/chat/inbox", headers=user, timeout=10).json()[0]
+                read = requests.post(f"{self.base_url}/chat/{packages[0]['id']}/read", headers=user, timeout=10).json()
+                after = requests.get(f"{self.base_url}/chat/inbox", headers=user, timeout=10).json()[0]
+                if unread["unread_count"] != 1 or read.get("marked") != 1 or after["unread_count"] != 0:
+                    self.log_result("Chat Inbox", False, f"Unread counts {unread['unread_count']} -> {after['unread_count']}, {read}")
+                    return False
+            
+            self.log_result("Chat Inbox", True, "Conversations listed most recent first and paged with X-Next-Cursor")
+            return True
+                
+        except Exception as e:
+            self.log_result("Chat Inbox", False, f"Request failed: {str(e)}")
+            return False
+
+    def test_agent_chat(self):
+        """Test staff provisioning and the agent inbox, reply and mark-read endpoints"""
+        print("🔄 Testing Agent Chat...")
+        
+        if not ADMIN_TOKEN:
+            print("   Skipped: set ADMIN_TOKEN to provision a staff account\n")
+            return True
+        
+        try:
+            package = requests.get(f"{self.base_url}/packages", headers=self.headers, timeout=10).json()[0]
+            _, customer = self.register_user("customer")
+            customer_id = requests.get(f"{self.base_url}/auth/me", headers=customer, timeout=10).json()["id"]
+            requests.post(f"{self.base_url}/chat/send", headers=customer,
+                          json={"package_id": package["id"], "message": "Is this trip available?"}, timeout=10)
+            
+            staff_name, staff = self.register_user("staff")
+            if requests.get(f"{self.base_url}/agent/conversations", headers=staff, timeout=10).status_code != 403:
+                self.log_result("Agent Chat", False, "Non-staff account could open the agent inbox")
+                return False
+            link = requests.put(
+                f"{self.base_url}/admin/staff/{staff_name}",
+                headers={**HEADERS, "X-Admin-Token": ADMIN_TOKEN},
+                json={"agent_id": package["agent_id"]},
+                timeout=10
+            )
+            if link.status_code != 200 or link.json().get("agent_id") != package["agent_id"]:
+                self.log_result("Agent Chat", False, f"Staff provisioning failed: HTTP {link.status_code}: {link.text}")
+                return False
+            
+            conversations = requests.get(
+                f"{self.base_url}/agent/conversations", headers=staff, params={"unread_only": "true"}, timeout=10
+            ).json()
+            conversation = next((c for c in conversations if c["user_id"] == customer_id), None)
+            if not conversation or conversation["unread_count"] != 1:
+                self.log_result("Agent Chat", False, f"Customer's message missing from agent inbox: {conversations}")
+                return False
+            
+            path = f"{self.base_url}/agent/conversations/{package['id']}/{customer_id}"
+            reply = requests.post(f"{path}/reply", headers=staff, json={"message": "Yes, book any day"}, timeout=10)
+            read = requests.post(f"{path}/read", headers=staff, timeout=10)
+            messages = requests.get(path, headers=staff, timeout=10).json()
+            if reply.status_code != 200 or read.json().get("marked") != 1:
+                self.log_result("Agent Chat", False, f"Reply/read failed: HTTP {reply.status_code}, {read.text}")
+                return False
+            if [m["sender_type"] for m in messages] != ["user", "agent"]:
+                self.log_result("Agent Chat", False, f"Unexpected conversation: {messages}")
+                return False
+            
+            self.log_result("Agent Chat", True, f"Staff account for agent {package['agent_id']} read and answered the conversation")
+            return True
+                
+        except Exception as e:
+            self.log_result("Agent Chat", False, f"Request failed: {str(e)}")
+            return False
+
     def run_all_tests(self):
         """Run all backend tests in sequence - FINAL VALIDATION FOCUS"""
         print("=" * 80)
@@ -1494,7 +2024,17 @@ class BackendTester:
             self.test_phase2_recommended_section,
             self.test_budget_travel_preview,
             self.test_enhanced_budget_travel_algorithm,
-            self.test_budget_travel_ribbon_integration
+            self.test_budget_travel_ribbon_integration,
+            self.test_search_api,
+            self.test_nearby_packages,
+            self.test_booking_idempotency,
+            self.test_bulk_booking,
+            self.test_booking_pagination,
+            self.test_package_inventory,
+            self.test_facets,
+            self.test_chat_cursors,
+            self.test_chat_inbox,
+            self.test_agent_chat
         ]
         
         for test_func in test_sequence:
@@ -136,8 +136,9 @@ export default function Home() {
         setUser(JSON.parse(userData));
       }
 
-      // Initialize sample data
-      await fetch(`${EXPO_PUBLIC_BACKEND_URL}/api/init-data`, {
+      // Initialize sample data; wait for the reseed to be swapped in so the
+      // agent and package ids loaded below are the live ones
+      await fetch(`${EXPO_PUBLIC_BACKEND_URL}/api/init-data?wait=true`, {
         method: 'POST',
         headers: {
           'Authorization': `Bearer ${token}`,
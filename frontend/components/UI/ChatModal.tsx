@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
   View,
   Text,
@@ -19,6 +19,15 @@ import { Button } from './Button';
 
 const EXPO_PUBLIC_BACKEND_URL = process.env.EXPO_PUBLIC_BACKEND_URL;
 
+// Dropped chat sockets reconnect with exponential backoff; after this many
+// failures in a row the history is also polled until a socket is back
+const RECONNECT_BASE_DELAY_MS = 1000;
+const RECONNECT_MAX_DELAY_MS = 30000;
+const RECONNECT_FAILURES_BEFORE_POLLING = 4;
+const HISTORY_POLL_INTERVAL_MS = 10000;
+// Close code for a rejected token or unknown package; retrying will not help
+const POLICY_VIOLATION = 1008;
+
 interface ChatMessage {
   id: string;
   user_id: string;
@@ -57,13 +66,104 @@ export const ChatModal: React.FC<ChatModalProps> = ({
   const [loading, setLoading] = useState(false);
   const [sending, setSending] = useState(false);
 
+  const socketRef = useRef<WebSocket | null>(null);
+
   useEffect(() => {
-    if (visible && selectedPackage) {
-      loadMessages();
-    }
+    if (!visible || !selectedPackage) return;
+
+    // Set by cleanup so work still awaiting storage or the network is dropped
+    let cancelled = false;
+    const isCancelled = () => cancelled;
+    setMessages([]);
+    loadMessages(isCancelled);
+    const stopSocket = keepSocketOpen(isCancelled);
+    return () => {
+      cancelled = true;
+      stopSocket();
+    };
   }, [visible, selectedPackage]);
 
-  const loadMessages = async () => {
+  // Fetched history merged with messages pushed meanwhile, by id, oldest first
+  const mergeMessages = (current: ChatMessage[], fetched: ChatMessage[]) => {
+    const byId = new Map(current.map((message) => [message.id, message]));
+    fetched.forEach((message) => byId.set(message.id, message));
+    return Array.from(byId.values()).sort(
+      (a, b) => new Date(a.timestamp).getTime() - new Date(b.timestamp).getTime()
+    );
+  };
+
+  // Keeps a live socket open until the returned stop function is called
+  const keepSocketOpen = (isCancelled: () => boolean) => {
+    let failures = 0;
+    let retryTimer: ReturnType<typeof setTimeout> | undefined;
+    let pollTimer: ReturnType<typeof setInterval> | undefined;
+
+    const stopPolling = () => {
+      if (pollTimer) clearInterval(pollTimer);
+      pollTimer = undefined;
+    };
+
+    const scheduleReconnect = () => {
+      failures += 1;
+      if (failures >= RECONNECT_FAILURES_BEFORE_POLLING && !pollTimer) {
+        pollTimer = setInterval(() => loadMessages(isCancelled), HISTORY_POLL_INTERVAL_MS);
+      }
+      const delay = Math.min(RECONNECT_BASE_DELAY_MS * 2 ** (failures - 1), RECONNECT_MAX_DELAY_MS);
+      retryTimer = setTimeout(connect, delay * (0.5 + Math.random() / 2));
+    };
+
+    const connect = async () => {
+      if (!selectedPackage || !EXPO_PUBLIC_BACKEND_URL) return;
+
+      const token = await AsyncStorage.getItem('auth_token');
+      if (isCancelled()) return;
+      const wsUrl = EXPO_PUBLIC_BACKEND_URL.replace(/^http/, 'ws');
+      const socket = new WebSocket(`${wsUrl}/api/chat/ws/${selectedPackage.id}`);
+
+      // The token goes in the first frame, not the URL, which would end up in access logs
+      socket.onopen = () => socket.send(JSON.stringify({ type: 'auth', token }));
+
+      // New messages are pushed by the server instead of re-fetching the history
+      socket.onmessage = (event) => {
+        try {
+          const data = JSON.parse(event.data);
+          if (data.type === 'ready') {
+            if (failures > 0) {
+              loadMessages(isCancelled); // Catch up on what was sent while disconnected
+            }
+            failures = 0;
+            stopPolling();
+          } else if (data.type === 'message') {
+            setMessages((current) =>
+              current.some((message) => message.id === data.message.id)
+                ? current
+                : [...current, data.message]
+            );
+          }
+        } catch (error) {
+          console.error('Error reading chat event:', error);
+        }
+      };
+
+      socket.onclose = (event) => {
+        if (socketRef.current === socket) socketRef.current = null;
+        if (isCancelled() || event.code === POLICY_VIOLATION) return;
+        scheduleReconnect();
+      };
+
+      socketRef.current = socket;
+    };
+
+    connect();
+    return () => {
+      if (retryTimer) clearTimeout(retryTimer);
+      stopPolling();
+      socketRef.current?.close();
+      socketRef.current = null;
+    };
+  };
+
+  const loadMessages = async (isCancelled: () => boolean = () => false) => {
     if (!selectedPackage) return;
     
     setLoading(true);
@@ -76,8 +176,9 @@ export const ChatModal: React.FC<ChatModalProps> = ({
       });
 
       if (response.ok) {
-        const chatMessages = await response.json();
-        setMessages(chatMessages);
+        const chatMessages: ChatMessage[] = await response.json();
+        if (isCancelled()) return;
+        setMessages((current) => mergeMessages(current, chatMessages));
       }
     } catch (error) {
       console.error('Error loading messages:', error);
@@ -106,7 +207,9 @@ export const ChatModal: React.FC<ChatModalProps> = ({
 
       if (response.ok) {
         setNewMessage('');
-        loadMessages(); // Reload messages to show the new one
+        if (socketRef.current?.readyState !== WebSocket.OPEN) {
+          loadMessages(); // No live connection, reload to show the new one
+        }
       } else {
         Alert.alert('Error', 'Failed to send message. Please try again.');
       }
@@ -191,7 +294,7 @@ export const ChatModal: React.FC<ChatModalProps> = ({
 
         {/* Messages */}
         <ScrollView style={styles.messagesContainer} showsVerticalScrollIndicator={false}>
-          {loading ? (
+          {loading && messages.length === 0 ? (
             <View style={styles.loadingContainer}>
               <ActivityIndicator size="large" color={colors.primary} />
               <Text style={styles.loadingText}>Loading messages...</Text>
@@ -6,6 +6,7 @@ Focused testing to validate critical functionality after frontend fixes
 
 import requests
 import json
+import os
 import sys
 from datetime import datetime, timedelta
 import uuid
@@ -13,6 +14,11 @@ import uuid
 # Configuration
 BASE_URL = "https://tripaggregator.preview.emergentagent.com/api"
 HEADERS = {"Content-Type": "application/json"}
+# The server's ADMIN_TOKEN; needed to restore TEST_FIXTURE
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+# Name of a fixture snapshot to restore instead of regenerating sample data
+INIT_PARAMS = {"wait": "true", "snapshot": os.environ["TEST_FIXTURE"]} if os.environ.get("TEST_FIXTURE") else {"wait": "true"}
+INIT_HEADERS = {"X-Admin-Token": ADMIN_TOKEN} if ADMIN_TOKEN else {}
 
 class Phase4Tester:
     def __init__(self):
@@ -263,7 +269,7 @@ class Phase4Tester:
         
         # Test POST /api/init-data
         try:
-            init_response = requests.post(f"{self.base_url}/init-data", headers=self.headers, timeout=30)
+            init_response = requests.post(f"{self.base_url}/init-data", params=INIT_PARAMS, headers={**self.headers, **INIT_HEADERS}, timeout=30)
             if init_response.status_code != 200:
                 self.log_result("Core Auth & Data APIs - Init Data", False, 
                               f"POST /api/init-data failed: HTTP {init_response.status_code}")
@@ -0,0 +1,94 @@
+"""In-process API tests.
+
+Unlike backend_test.py, which drives a deployed server over HTTP, these run
+server.app with FastAPI's TestClient so they can reach into the database and
+inject failures. They need the MongoDB named by MONGO_URL (default
+mongodb://localhost:27017) and use a throwaway database that is dropped at
+the end of the session; without a reachable server they are skipped.
+"""
+import gzip
+import hashlib
+import json
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ["DB_NAME"] = f"sponsoredtrip_test_{uuid.uuid4().hex[:8]}"
+
+
+@pytest.fixture(scope="session")
+def server():
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+
+    try:
+        MongoClient(os.environ["MONGO_URL"], serverSelectionTimeoutMS=2000).admin.command("ping")
+    except PyMongoError:
+        pytest.skip("MongoDB is not reachable at MONGO_URL")
+
+    import server
+    return server
+
+
+@pytest.fixture(scope="session")
+def client(server):
+    from fastapi.testclient import TestClient
+
+    # One client for the session: Motor stays bound to the loop it first ran on
+    with TestClient(server.app) as client:
+        yield client
+        client.portal.call(server.client.drop_database, os.environ["DB_NAME"])
+
+
+@pytest.fixture(scope="session")
+def call(client):
+    """Run a coroutine function on the app's event loop"""
+    return client.portal.call
+
+
+@pytest.fixture
+def auth_headers(client):
+    name = f"user_{uuid.uuid4().hex[:8]}"
+    response = client.post("/api/auth/register", json={
+        "username": name,
+        "email": f"{name}@example.com",
+        "password": "SecurePass123!",
+        "full_name": "Test User"
+    })
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def admin_headers(server, monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "test-admin-token")
+    return {"X-Admin-Token": "test-admin-token"}
+
+
+@pytest.fixture
+def write_snapshot(server, monkeypatch, tmp_path):
+    """Write a BSON fixture snapshot under a temporary FIXTURES_DIR; returns its name"""
+    import bson
+    import fixtures
+
+    monkeypatch.setattr(server, "FIXTURES_DIR", tmp_path)
+
+    def write(name, collections):
+        path = tmp_path / name
+        path.mkdir()
+        entries = {}
+        for collection, documents in collections.items():
+            data = b"".join(bson.encode(document) for document in documents)
+            with gzip.open(fixtures.snapshot_file(path, collection, "bson"), "wb") as out:
+                out.write(data)
+            entries[collection] = {"count": len(documents), "sha256": hashlib.sha256(data).hexdigest()}
+        manifest = {"format": "bson", "collections": entries, "fingerprint": fixtures.fingerprint("bson", entries)}
+        (path / fixtures.MANIFEST).write_text(json.dumps(manifest))
+        return name
+
+    return write
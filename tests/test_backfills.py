@@ -0,0 +1,47 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+
+def legacy_package(_id, duration):
+    """A package as stored before duration_days was normalized"""
+    return {
+        "_id": _id,
+        "id": str(_id),
+        "agent_id": "agent-backfill-test",
+        "title": "Legacy Trip",
+        "description": "Written before duration_days existed",
+        "price": 9000,
+        "duration": duration,
+        "destination": "Shimla",
+        "image_base64": "",
+        "features": [],
+        "is_active": True,
+        "created_at": datetime.utcnow()
+    }
+
+
+def test_backfill_picks_up_packages_below_an_old_checkpoint(call, server):
+    call(server.db.packages.insert_one, legacy_package(ObjectId(), "4 days 3 nights"))
+    call(server.backfill_duration_days)
+
+    # Inserted afterwards but with an older _id, as a reseed reusing ids would
+    older = ObjectId.from_datetime(datetime(2020, 1, 1))
+    call(server.db.packages.insert_one, legacy_package(older, "6 days 5 nights"))
+    call(server.backfill_duration_days)
+
+    package = call(server.db.packages.find_one, {"_id": older})
+    assert package["duration_days"] == 6
+
+
+def test_fixture_restore_backfills_duration_days(client, call, server, admin_headers, write_snapshot):
+    call(server.db.packages.insert_one, legacy_package(ObjectId(), "2 days 1 night"))
+    call(server.backfill_duration_days)
+
+    restored = legacy_package(ObjectId.from_datetime(datetime(2019, 6, 1)), "5 days 4 nights")
+    name = write_snapshot("legacy", {"packages": [restored]})
+    response = client.post("/api/init-data", params={"snapshot": name, "wait": "true"}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+
+    package = call(server.db.packages.find_one, {"id": restored["id"]})
+    assert package["duration_days"] == 5
@@ -0,0 +1,40 @@
+def make_package(server, price, destination="Goa"):
+    return server.Package(
+        agent_id="agent-preview-test",
+        title=f"{destination} Trip",
+        description="Budget preview test package",
+        price=price,
+        duration="3 days 2 nights",
+        duration_days=3,
+        destination=destination,
+        image_base64="",
+        features=[]
+    )
+
+
+def test_preview_price_range_recovers_from_empty_catalog(client, call, server):
+    call(server.db.packages.delete_many, {})
+    call(server.rebuild_budget_preview)
+
+    stats = call(server.db.catalog_stats.find_one, {"_id": server.PREVIEW_STATS_ID})
+    assert stats["total_packages"] == 0
+    assert stats.get("min_price") is None and stats.get("max_price") is None
+
+    call(server.save_package, make_package(server, 8000))
+    call(server.save_package, make_package(server, 12000, "Manali"))
+
+    preview = client.get("/api/budget-travel/preview").json()
+    assert preview["total_packages"] == 2
+    assert preview["price_range"] == {"min": 8000, "max": 12000}
+
+
+def test_preview_repairs_null_bounds_from_older_summaries(client, call, server):
+    call(server.db.packages.delete_many, {})
+    call(server.rebuild_budget_preview)
+    call(server.db.catalog_stats.update_one,
+         {"_id": server.PREVIEW_STATS_ID}, {"$set": {"min_price": None, "max_price": None}})
+
+    call(server.save_package, make_package(server, 6500))
+
+    preview = client.get("/api/budget-travel/preview").json()
+    assert preview["price_range"] == {"min": 6500, "max": 6500}
@@ -0,0 +1,59 @@
+import pytest
+from pymongo.errors import AutoReconnect
+
+TRAVEL_DATE = "2031-03-01T00:00:00"
+
+
+@pytest.fixture
+def limited_packages(client):
+    client.post("/api/init-data", params={"wait": "true"}).raise_for_status()
+    return [package for package in client.get("/api/packages").json() if package.get("daily_capacity")][:2]
+
+
+def remaining(client, packages):
+    response = client.get("/api/availability", params={
+        "package_ids": [package["id"] for package in packages], "start": TRAVEL_DATE[:10], "end": TRAVEL_DATE[:10]
+    })
+    return {package["package_id"]: package["days"][0]["remaining"] for package in response.json()["packages"]}
+
+
+def test_failed_insert_releases_seats_and_removes_partial_group(client, server, auth_headers, limited_packages,
+                                                                monkeypatch):
+    before = remaining(client, limited_packages)
+
+    # The first booking lands, then the connection drops: not a BulkWriteError
+    collection_type = type(server.db.bookings)
+    insert_many = collection_type.insert_many
+
+    async def failing_insert_many(self, documents, *args, **kwargs):
+        if self.name != "bookings":
+            return await insert_many(self, documents, *args, **kwargs)
+        await insert_many(self, documents[:1], *args, **kwargs)
+        raise AutoReconnect("connection lost mid-batch")
+
+    monkeypatch.setattr(collection_type, "insert_many", failing_insert_many)
+    response = client.post("/api/bookings/bulk", headers=auth_headers, json={
+        "items": [{"package_id": package["id"], "travel_date": TRAVEL_DATE} for package in limited_packages],
+        "num_persons": 3
+    })
+    monkeypatch.undo()
+
+    assert response.status_code == 500
+    assert remaining(client, limited_packages) == before
+    assert client.get("/api/bookings", headers=auth_headers).json() == []
+
+
+def test_sold_out_item_releases_seats_taken_for_earlier_items(client, auth_headers, limited_packages):
+    first, second = limited_packages
+    capacity = second["daily_capacity"]
+    client.post("/api/bookings/bulk", headers=auth_headers, json={
+        "items": [{"package_id": second["id"], "travel_date": TRAVEL_DATE}], "num_persons": capacity
+    }).raise_for_status()
+    before = remaining(client, limited_packages)
+
+    response = client.post("/api/bookings/bulk", headers=auth_headers, json={
+        "items": [{"package_id": package["id"], "travel_date": TRAVEL_DATE} for package in limited_packages]
+    })
+
+    assert response.status_code == 409
+    assert remaining(client, limited_packages) == before
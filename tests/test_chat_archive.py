@@ -0,0 +1,111 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+MESSAGE_COUNT = 20
+PAGE_SIZE = 4
+
+
+@pytest.fixture
+def conversation(client, call, server, auth_headers, monkeypatch):
+    """20 messages a day apart, 39.5 to 20.5 days old, all still in the hot collection"""
+    # Small buckets so pages cross bucket boundaries as well as the hot/archive one
+    monkeypatch.setattr(server.chat_archive, "bucket_size", 3)
+    monkeypatch.setattr(server.chat_archive, "hot_retention", timedelta(days=30))
+
+    user_id = client.get("/api/auth/me", headers=auth_headers).json()["id"]
+    package_id = str(uuid.uuid4())
+    start = datetime.utcnow().replace(microsecond=0) - timedelta(days=39, hours=12)
+    messages = [
+        server.ChatMessage(
+            user_id=user_id,
+            package_id=package_id,
+            agent_id="agent-archive-test",
+            message=f"message {i}",
+            sender_type="user" if i % 2 else "agent",
+            # 2 and 3 share a timestamp and land in different buckets
+            timestamp=start + timedelta(days=2 if i == 3 else i)
+        ).dict()
+        for i in range(MESSAGE_COUNT)
+    ]
+    call(server.db.chat_messages.insert_many, [dict(message) for message in messages])
+    return package_id, sorted(messages, key=lambda message: (message["timestamp"], message["id"]))
+
+
+def page_back(client, headers, package_id, between_pages=lambda: None):
+    """Walk the conversation newest page first; returns its ids oldest first"""
+    pages, params = [], {"limit": PAGE_SIZE}
+    while True:
+        response = client.get(f"/api/chat/{package_id}", headers=headers, params=params)
+        response.raise_for_status()
+        pages.insert(0, [message["id"] for message in response.json()])
+        before = response.headers.get("X-Before-Cursor")
+        if not before:
+            return [message_id for page in pages for message_id in page]
+        between_pages()
+        params = {"limit": PAGE_SIZE, "before": before}
+
+
+def test_paging_back_crosses_into_the_archive(client, call, server, auth_headers, conversation):
+    package_id, messages = conversation
+    ids = [message["id"] for message in messages]
+    assert call(server.chat_archive.compact) == 10
+
+    assert page_back(client, auth_headers, package_id) == ids
+
+
+def test_paging_back_while_compaction_moves_messages(client, call, server, auth_headers, conversation, monkeypatch):
+    package_id, messages = conversation
+    ids = [message["id"] for message in messages]
+    retention = iter(range(34, 0, -3))
+
+    def compact_more():
+        # Each run archives a few more days, including ones already paged past
+        monkeypatch.setattr(server.chat_archive, "hot_retention", timedelta(days=next(retention)))
+        call(server.chat_archive.compact)
+
+    assert page_back(client, auth_headers, package_id, compact_more) == ids
+
+
+def test_since_cursor_catches_up_through_the_archive(client, call, server, auth_headers, conversation):
+    package_id, messages = conversation
+    ids = [message["id"] for message in messages]
+    # A client that last synced when only the oldest message existed
+    since = server.encode_cursor(messages[0]["timestamp"], messages[0]["id"])
+    call(server.chat_archive.compact)
+
+    caught_up = []
+    while True:
+        response = client.get(f"/api/chat/{package_id}", headers=auth_headers, params={"limit": PAGE_SIZE, "since": since})
+        page = [message["id"] for message in response.json()]
+        if not page:
+            break
+        caught_up += page
+        since = response.headers["X-Since-Cursor"]
+    assert caught_up == ids[1:]
+
+
+def test_buckets_expire_after_their_newest_message(call, server, conversation, monkeypatch):
+    package_id, _ = conversation
+    monkeypatch.setattr(server.chat_archive, "ttl", timedelta(days=365))
+    call(server.chat_archive.compact)
+
+    buckets = call(server.db.chat_archive.find({"package_id": package_id}).to_list, None)
+    assert sum(bucket["count"] for bucket in buckets) == 10
+    for bucket in buckets:
+        assert bucket["expires_at"] == bucket["last_timestamp"] + timedelta(days=365)
+        assert bucket["last_timestamp"] == max(message["timestamp"] for message in bucket["messages"])
+
+    indexes = call(server.db.chat_archive.index_information)
+    assert any(index["key"] == [("expires_at", 1)] and index.get("expireAfterSeconds") == 0
+               for index in indexes.values())
+
+
+def test_buckets_are_kept_without_a_ttl(call, server, conversation, monkeypatch):
+    package_id, _ = conversation
+    monkeypatch.setattr(server.chat_archive, "ttl", None)
+    call(server.chat_archive.compact)
+
+    buckets = call(server.db.chat_archive.find({"package_id": package_id}).to_list, None)
+    assert buckets and all("expires_at" not in bucket for bucket in buckets)
@@ -0,0 +1,53 @@
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+
+@pytest.fixture
+def package_id(client, call, server):
+    package = server.Package(
+        agent_id="agent-websocket-test",
+        title="Coorg Trip",
+        description="Chat WebSocket test package",
+        price=7000,
+        duration="2 days 1 night",
+        duration_days=2,
+        destination="Coorg",
+        image_base64="",
+        features=[]
+    )
+    call(server.save_package, package)
+    return package.id
+
+
+def bearer_token(auth_headers):
+    return auth_headers["Authorization"].split(" ", 1)[1]
+
+
+def test_first_frame_authenticates_and_opens_the_session(client, auth_headers, package_id):
+    with client.websocket_connect(f"/api/chat/ws/{package_id}") as socket:
+        socket.send_json({"type": "auth", "token": bearer_token(auth_headers)})
+        assert socket.receive_json() == {"type": "ready"}
+
+        socket.send_json({"message": "Is breakfast included?"})
+        event = socket.receive_json()
+        assert event["type"] == "message" and event["message"]["message"] == "Is breakfast included?"
+
+
+@pytest.mark.parametrize("first_frame", [
+    {"type": "auth", "token": "not-a-jwt"},
+    {"message": "hello without authenticating"},
+])
+def test_session_without_a_valid_auth_frame_is_closed(client, package_id, first_frame):
+    with client.websocket_connect(f"/api/chat/ws/{package_id}") as socket:
+        socket.send_json(first_frame)
+        with pytest.raises(WebSocketDisconnect) as closed:
+            socket.receive_json()
+    assert closed.value.code == 1008
+
+
+def test_token_in_the_query_string_is_not_accepted(client, auth_headers, package_id):
+    with client.websocket_connect(f"/api/chat/ws/{package_id}?token={bearer_token(auth_headers)}") as socket:
+        socket.send_json({"message": "hello"})
+        with pytest.raises(WebSocketDisconnect) as closed:
+            socket.receive_json()
+    assert closed.value.code == 1008
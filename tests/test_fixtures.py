@@ -0,0 +1,52 @@
+import uuid
+
+
+def test_restoring_the_loaded_snapshot_undoes_package_edits(client, call, server, admin_headers, write_snapshot):
+    agent = server.Agent(
+        name="Fixture Travels",
+        type="travel",
+        description="Snapshot restore test agent",
+        rating=4.5,
+        total_bookings=0,
+        location="Jaipur",
+        contact_phone="+91 90000 00000",
+        contact_email="fixture@example.com",
+        image_base64="",
+        avatar_id="agent_1"
+    ).dict()
+    package = server.Package(
+        agent_id=agent["id"],
+        title="Jaipur Heritage Walk",
+        description="Snapshot restore test package",
+        price=5500,
+        duration="2 days 1 night",
+        duration_days=2,
+        destination="Jaipur",
+        image_base64="",
+        features=["Guide"]
+    ).dict()
+    name = write_snapshot("catalog", {"agents": [agent], "packages": [package]})
+
+    def restore():
+        return client.post("/api/init-data", params={"snapshot": name, "wait": "true"}, headers=admin_headers)
+
+    assert restore().status_code == 200
+    original = call(server.db.packages.find_one, {"id": package["id"]}, {"_id": 0})
+
+    # A staff account for the agent reprices and renames the package
+    username = f"staff_{uuid.uuid4().hex[:8]}"
+    staff = client.post("/api/auth/register", json={
+        "username": username, "email": f"{username}@example.com", "password": "SecurePass123!", "full_name": "Staff"
+    }).json()
+    client.put(f"/api/admin/staff/{username}", headers=admin_headers, json={"agent_id": agent["id"]}).raise_for_status()
+    edit = {key: package[key] for key in server.PackageCreate.__fields__ if key in package}
+    client.put(
+        f"/api/packages/{package['id']}",
+        headers={"Authorization": f"Bearer {staff['access_token']}"},
+        json={**edit, "title": "Edited Walk", "price": 999}
+    ).raise_for_status()
+
+    assert restore().status_code == 200
+
+    assert call(server.db.packages.find_one, {"id": package["id"]}, {"_id": 0}) == original
+    assert client.get("/api/budget-travel/preview").json()["price_range"] == {"min": 5500, "max": 5500}
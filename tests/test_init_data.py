@@ -0,0 +1,20 @@
+import asyncio
+
+import httpx
+
+
+def test_concurrent_waiting_reloads_share_one_load(call, server):
+    async def reload_twice():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(*(http.post("/api/init-data", params={"wait": "true"}) for _ in range(2)))
+
+    first, second = call(reload_twice)
+
+    assert first.status_code == second.status_code == 200
+    statuses = [first.json()["status"], second.json()["status"]]
+    # Both answered once the same load had finished, not while it was running
+    assert [status["state"] for status in statuses] == ["completed", "completed"]
+    assert statuses[0]["started_at"] == statuses[1]["started_at"]
+    assert not server.seed_loader.running
+    assert call(server.db.agents.count_documents, {}) == 100
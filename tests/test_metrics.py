@@ -0,0 +1,30 @@
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+
+from metrics import MetricsMiddleware, RequestMetrics
+
+
+def test_in_progress_gauge_is_labelled_by_route_template():
+    metrics = RequestMetrics()
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+    # Both render the metrics while their own request is still being served
+    @app.get("/probe/{item}", response_class=PlainTextResponse)
+    async def probe(item: str):
+        return "\n".join(metrics.render())
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def scrape():
+        return "\n".join(metrics.render())
+
+    client = TestClient(app)
+
+    during = client.get("/probe/42").text.splitlines()
+    assert 'http_requests_in_progress{method="GET",route="/probe/{item}"} 1' in during
+
+    after = client.get("/metrics").text.splitlines()
+    assert 'http_requests_in_progress{method="GET",route="/probe/{item}"} 0' in after
+    assert 'http_requests_in_progress{method="GET",route="/metrics"} 1' in after
+    assert not metrics.in_flight
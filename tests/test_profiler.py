@@ -0,0 +1,29 @@
+import pytest
+
+
+@pytest.fixture
+def profile_dir(server, monkeypatch, tmp_path):
+    monkeypatch.setattr(server.request_profiler, "output_dir", tmp_path)
+    return tmp_path
+
+
+def test_admin_token_in_x_profile_profiles_the_request(client, admin_headers, profile_dir):
+    response = client.get("/api/agents", params={"limit": 5}, headers={"X-Profile": admin_headers["X-Admin-Token"]})
+    profile_id = response.headers["X-Profile-Id"]
+
+    listed = client.get("/api/admin/profiles", headers=admin_headers).json()
+    assert profile_id in [profile["id"] for profile in listed]
+
+    folded = client.get(f"/api/admin/profiles/{profile_id}", headers=admin_headers)
+    assert folded.status_code == 200
+    assert folded.text.startswith("# GET /api/agents ")
+
+
+def test_profiling_and_profiles_need_the_admin_token(client, admin_headers, profile_dir):
+    response = client.get("/api/agents", params={"limit": 5}, headers={"X-Profile": "wrong"})
+    assert "X-Profile-Id" not in response.headers
+    assert not list(profile_dir.iterdir())
+
+    assert client.get("/api/admin/profiles").status_code == 404
+    assert client.get("/api/admin/profiles", headers={"X-Admin-Token": "wrong"}).status_code == 404
+    assert client.get("/api/admin/profiles/unknown-profile", headers=admin_headers).status_code == 404
@@ -0,0 +1,14 @@
+import uuid
+
+
+def test_ribbons_reload_after_another_worker_bumps_the_catalog(client, call, server):
+    client.post("/api/init-data", params={"wait": "true"}).raise_for_status()
+    client.get("/api/ribbons").raise_for_status()
+
+    # Another worker reseeds: the ribbons change underneath this worker's cache
+    title = f"Reseeded {uuid.uuid4().hex[:8]}"
+    call(server.db.ribbons.update_one, {"type": "explore"}, {"$set": {"title": title}})
+    assert title not in [ribbon["title"] for ribbon in client.get("/api/ribbons").json()]
+
+    call(server.bump_catalog_version)
+    assert title in [ribbon["title"] for ribbon in client.get("/api/ribbons").json()]